@@ -0,0 +1,628 @@
+import json
+import os
+import shutil
+from abc import ABC, abstractmethod
+
+import numpy as np
+import pandas as pd
+
+from indexes import parse_dates
+from queries import Condition
+
+try:
+    import fcntl
+except ImportError:  # Advisory locks are not available on Windows
+    fcntl = None
+
+
+def sync_directory(path: str) -> None:
+    """Flushes the directory entry of the file, so a created or renamed file survives a power loss."""
+    if os.name == 'nt':  # Directories cannot be opened on Windows, their entries are flushed with the files
+        return
+
+    fd = os.open(os.path.dirname(os.path.abspath(path)), os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+class AbstractBackend(ABC):
+    """Defines how the table of the database is stored on disk."""
+
+    # Whether a record interrupted halfway by append() leaves the table readable.
+    # Otherwise new records are committed to the write-ahead log of the store, and append() is never called
+    atomic_append = False
+
+    def __init__(self, path: str):
+        self.path = path
+
+    @abstractmethod
+    def stat(self) -> tuple[int, int]:
+        """Modification time and size of the file that changes with every write."""
+        pass
+
+    @abstractmethod
+    def read(self) -> pd.DataFrame:
+        """Reads the whole table indexed by the primary key."""
+        pass
+
+    @abstractmethod
+    def read_keys(self) -> np.ndarray:
+        """Reads only the primary keys."""
+        pass
+
+    def append(self, frame: pd.DataFrame, sync: bool = True) -> None:
+        """
+        Writes the records, indexed by their primary keys, to the end of the table at once.
+        With sync=False the data is not flushed to the disk until sync() is called.
+        Only the formats with atomic_append implement it.
+        """
+        raise NotImplementedError
+
+    def sync(self) -> None:
+        """Flushes all appended records to the disk."""
+        raise NotImplementedError
+
+    def truncate(self, rows: int) -> None:
+        """Removes the records appended after the table had the given number of rows."""
+        raise NotImplementedError
+
+    @abstractmethod
+    def write(self, frame: pd.DataFrame) -> None:
+        """Replaces the whole table. An interrupted write leaves the previous table intact."""
+        pass
+
+    def open(self) -> 'FrameTable | MappedTable':
+        """Opens the table for queries. By default the whole table is read into memory."""
+        return FrameTable(self.read())
+
+
+class CsvBackend(AbstractBackend):
+    """Plain CSV file. Stays the format for import and export of the data."""
+
+    # Types of the columns, as stored by the columnar format. Without them a file with a header only
+    # is read with text columns, and the numbers of the records replayed on top of it would stay text
+    dtypes = {'pk': np.int64, 'date': object, 'type': object, 'amount': np.int64, 'descr': object}
+
+    def stat(self) -> tuple[int, int]:
+        stat = os.stat(self.path)
+        return stat.st_mtime_ns, stat.st_size
+
+    def read(self) -> pd.DataFrame:
+        return pd.read_csv(self.path, index_col='pk', dtype=self.dtypes)
+
+    def read_keys(self) -> np.ndarray:
+        return pd.read_csv(self.path, usecols=['pk'], dtype=self.dtypes).pk.to_numpy()
+
+    def write(self, frame: pd.DataFrame) -> None:
+        """Writes the table into a temporary file and then swaps it with the current one."""
+        temp_path = f'{self.path}.tmp'
+        with open(temp_path, 'w', encoding='utf-8', newline='') as file:
+            frame.to_csv(file, lineterminator=os.linesep)
+            file.flush()
+            os.fsync(file.fileno())
+
+        os.replace(temp_path, self.path)
+        sync_directory(self.path)
+
+
+class ColumnarBackend(AbstractBackend):
+    """
+    Compact binary format: a directory with one file per column.
+    Numbers are stored as typed arrays, dates as int32 day numbers, transaction types as uint8 codes
+    and descriptions as a heap of UTF-8 bytes with an array of end offsets.
+    All columns are opened with np.memmap, so nothing is parsed on load.
+
+    Appending a record adds a few bytes to the end of every column file. The key column is written last
+    and defines the number of records, so a record interrupted halfway is simply not visible.
+
+    The column files are kept in a version directory ("v1", "v2", ...) named by the "current" file.
+    A rewrite creates the next version aside, flushes it to the disk and then replaces the pointer,
+    so the database is complete at any moment. A table opened for reading is bound to its version,
+    and the previous version is kept until the next rewrite, so readers of other processes never
+    see the files disappear under them.
+    """
+
+    atomic_append = True
+
+    # Column files and the types of their elements
+    columns = {
+        'pk': np.int64,
+        'date': np.int32,
+        'type': np.uint8,
+        'amount': np.int64,
+        'descr.offsets': np.int64,
+    }
+    # Day number stored for a missing date
+    no_date = np.iinfo(np.int32).min
+    # Type code stored for a missing type, so at most 255 distinct types fit into the column
+    no_type = np.iinfo(np.uint8).max
+
+    def __init__(self, path: str, version: str = None):
+        super().__init__(path)
+        # Version directory the backend is bound to, the current one if None
+        self.version = version
+
+    @property
+    def root(self) -> str:
+        """Directory with the column files."""
+        version = self.version
+        if version is None:
+            with open(os.path.join(self.path, 'current'), encoding='ascii') as file:
+                version = file.read().strip()
+        return os.path.join(self.path, version)
+
+    def pin(self) -> 'ColumnarBackend':
+        """Returns the backend bound to the current version, which stays readable while the table is rewritten."""
+        return self if self.version is not None else ColumnarBackend(self.path, os.path.basename(self.root))
+
+    def _get_path(self, name: str, root: str = None) -> str:
+        return os.path.join(root or self.root, name)
+
+    def read_meta(self) -> dict:
+        try:
+            with open(self._get_path('meta.json'), encoding='utf-8') as file:
+                return json.load(file)
+        except FileNotFoundError:
+            return {'types': []}
+
+    def _write_meta(self, meta: dict, root: str = None) -> None:
+        # Appended type codes refer to the new types, so they have to reach the disk before the codes
+        temp_path = self._get_path('meta.json.tmp', root)
+        with open(temp_path, 'w', encoding='utf-8') as file:
+            json.dump(meta, file, ensure_ascii=False)
+            file.flush()
+            os.fsync(file.fileno())
+        os.replace(temp_path, self._get_path('meta.json', root))
+        sync_directory(temp_path)
+
+    def map_column(self, name: str, rows: int = None) -> np.ndarray:
+        """Maps the column file into memory without reading it. Empty files are returned as empty arrays."""
+        dtype = self.columns[name]
+        size = os.path.getsize(self._get_path(name))
+        rows = size // np.dtype(dtype).itemsize if rows is None else rows
+
+        if not rows:
+            return np.empty(0, dtype=dtype)
+        return np.memmap(self._get_path(name), dtype=dtype, mode='r', shape=(rows,))
+
+    @property
+    def rows(self) -> int:
+        return os.path.getsize(self._get_path('pk')) // np.dtype(np.int64).itemsize
+
+    def stat(self) -> tuple[int, int]:
+        stat = os.stat(self._get_path('pk'))
+        return stat.st_mtime_ns, stat.st_size
+
+    def read(self) -> pd.DataFrame:
+        if self.version is None:
+            return self.pin().read()
+
+        rows = self.rows
+        types = np.full(self.no_type + 1, np.nan, dtype=object)
+        known = self.read_meta()['types']
+        types[:len(known)] = known
+
+        ordinals = self.map_column('date', rows)
+        dates = np.datetime_as_string(ordinals.astype('datetime64[D]'), unit='D').astype(object)
+        dates[ordinals == self.no_date] = np.nan
+
+        return pd.DataFrame({
+            'date': dates,
+            'type': types[self.map_column('type', rows)],
+            'amount': np.asarray(self.map_column('amount', rows)),
+            'descr': self.decode_descr(),
+        }, index=pd.Index(np.asarray(self.map_column('pk', rows)), name='pk'))
+
+    def read_keys(self) -> np.ndarray:
+        backend = self.pin()
+        return np.asarray(backend.map_column('pk', backend.rows))
+
+    def open(self) -> 'MappedTable':
+        """Opens the current version of the table lazily, nothing is read until a column is touched."""
+        return MappedTable(self.pin())
+
+    def _get_descr_bounds(self, positions: np.ndarray = None) -> tuple[np.ndarray, np.ndarray]:
+        """Returns start and end offsets of the descriptions in the heap."""
+        ends = self.map_column('descr.offsets', self.rows)
+        if positions is None:
+            return np.concatenate(([0], ends[:-1])).astype(np.int64), np.asarray(ends)
+
+        positions = np.asarray(positions, dtype=np.int64)
+        starts = np.where(positions > 0, ends[positions - 1], 0) if len(positions) else positions
+        return starts, ends[positions]
+
+    def _map_heap(self) -> np.ndarray:
+        path = self._get_path('descr.heap')
+        if not os.path.getsize(path):
+            return np.empty(0, dtype=np.uint8)
+        return np.memmap(path, dtype=np.uint8, mode='r')
+
+    def decode_descr(self, positions: np.ndarray = None) -> np.ndarray:
+        """Decodes descriptions of the rows at the given positions only (or of all rows)."""
+        starts, ends = self._get_descr_bounds(positions)
+        heap = self._map_heap()
+
+        result = np.empty(len(starts), dtype=object)
+        for i, (start, end) in enumerate(zip(starts.tolist(), ends.tolist())):
+            result[i] = heap[start:end].tobytes().decode('utf-8')
+        return result
+
+    def descr_equals(self, value: str, positions: np.ndarray = None) -> np.ndarray:
+        """
+        Compares descriptions of the rows at the given positions (or of all rows) with the value.
+        Only the descriptions of the same length in bytes are read from the heap.
+        """
+        starts, ends = self._get_descr_bounds(positions)
+        expected = value.encode('utf-8')
+        heap = self._map_heap()
+
+        mask = np.zeros(len(starts), dtype=bool)
+        for i in np.flatnonzero(ends - starts == len(expected)).tolist():
+            mask[i] = heap[starts[i]:ends[i]].tobytes() == expected
+        return mask
+
+    @classmethod
+    def _encode_dates(cls, dates) -> np.ndarray:
+        """Converts dates into day numbers. A date that cannot be parsed is refused rather than lost."""
+        dates = pd.Series(dates, dtype=object)
+        parsed = parse_dates(dates)
+        missing = np.isnat(parsed)
+
+        invalid = dates[missing & dates.notna().to_numpy() & (dates != '').to_numpy()]
+        if len(invalid):
+            raise ValueError(f'dates that cannot be parsed: {", ".join(map(str, invalid.unique()[:5]))}')
+
+        ordinals = parsed.astype(np.int64)
+        ordinals[missing] = cls.no_date
+        return ordinals.astype(np.int32)
+
+    @classmethod
+    def _encode_types(cls, values, types: list) -> np.ndarray:
+        """Converts types into their codes in the list, a missing type gets the reserved code."""
+        if len(types) > cls.no_type:
+            raise ValueError(f'more than {cls.no_type} transaction types')
+        codes = pd.Categorical(values, categories=types).codes
+        return np.where(codes < 0, cls.no_type, codes).astype(np.uint8)
+
+    def append(self, frame: pd.DataFrame, sync: bool = True) -> None:
+        """Writes the records to the end of every column file. Appends of several processes are serialized by a lock."""
+        lock = os.open(os.path.join(self.path, 'lock'), os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            if fcntl:
+                fcntl.flock(lock, fcntl.LOCK_EX)
+            self._append(frame, sync)
+        finally:
+            os.close(lock)
+
+    def sync(self) -> None:
+        # The key column defines the number of records, so it is flushed last
+        for name in ('descr.heap', *reversed(self.columns)):
+            fd = os.open(self._get_path(name), os.O_RDONLY)
+            try:
+                os.fsync(fd)
+            finally:
+                os.close(fd)
+
+    def truncate(self, rows: int) -> None:
+        """Cuts the column files back to the given number of rows, the key column that defines it first."""
+        ends = self.map_column('descr.offsets', rows)
+        sizes = {
+            'pk': rows * 8,
+            'amount': rows * 8,
+            'type': rows,
+            'date': rows * 4,
+            'descr.offsets': rows * 8,
+            'descr.heap': int(ends[-1]) if rows else 0,
+        }
+
+        for name, size in sizes.items():
+            fd = os.open(self._get_path(name), os.O_RDWR)
+            try:
+                os.ftruncate(fd, size)
+                os.fsync(fd)
+            finally:
+                os.close(fd)
+
+    @staticmethod
+    def _encode_descr(values) -> list[bytes]:
+        return [value.encode('utf-8') if isinstance(value, str) else b'' for value in values]
+
+    def _append(self, frame: pd.DataFrame, sync: bool) -> None:
+        meta = self.read_meta()
+        new_types = [type_ for type_ in dict.fromkeys(frame.type.dropna()) if type_ not in meta['types']]
+        # Everything is encoded before the first write, so refused records leave the files untouched
+        dates = self._encode_dates(frame.date)
+        types = self._encode_types(frame.type, meta['types'] + new_types)
+        if new_types:
+            meta['types'] += new_types
+            self._write_meta(meta)
+
+        rows = self.rows
+        descr = self._encode_descr(frame.descr)
+        heap_size = int(self.map_column('descr.offsets', rows)[-1]) if rows else 0
+
+        values = {
+            'descr.heap': b''.join(descr),
+            'descr.offsets': (heap_size + np.cumsum([len(value) for value in descr], dtype=np.int64)).tobytes(),
+            'date': dates.tobytes(),
+            'type': types.tobytes(),
+            'amount': frame.amount.to_numpy(dtype=np.int64).tobytes(),
+            'pk': frame.index.to_numpy(dtype=np.int64).tobytes(),
+        }
+        # Offsets to write at. The leftovers of an interrupted append beyond them are cut off
+        offsets = {
+            'descr.heap': heap_size,
+            'descr.offsets': rows * 8,
+            'date': rows * 4,
+            'type': rows,
+            'amount': rows * 8,
+            'pk': rows * 8,
+        }
+
+        for name, data in values.items():
+            fd = os.open(self._get_path(name), os.O_RDWR)
+            try:
+                os.ftruncate(fd, offsets[name])
+                os.pwrite(fd, data, offsets[name])
+                if sync:
+                    os.fsync(fd)
+            finally:
+                os.close(fd)
+
+    def write(self, frame: pd.DataFrame) -> None:
+        """
+        Writes the table into the next version directory and then points the database to it.
+        Everything is flushed to the disk before the pointer is replaced, and the pointer is replaced
+        with one rename, so an interrupted write leaves the previous version current.
+        """
+        # The records are encoded first, so a table that cannot be stored leaves the database untouched
+        types = list(dict.fromkeys(frame.type.dropna()))
+        descr = self._encode_descr(frame.descr)
+
+        data = {
+            'pk': frame.index.to_numpy(dtype=np.int64),
+            'date': self._encode_dates(frame.date),
+            'type': self._encode_types(frame.type, types),
+            'amount': frame.amount.to_numpy(dtype=np.int64),
+            'descr.offsets': np.cumsum([len(value) for value in descr], dtype=np.int64),
+            'descr.heap': b''.join(descr),
+        }
+
+        os.makedirs(self.path, exist_ok=True)
+        try:
+            previous = os.path.basename(self.root)
+        except FileNotFoundError:  # A new database
+            previous = None
+        version = f'v{int(previous[1:]) + 1 if previous else 1}'
+
+        temp_root = os.path.join(self.path, f'{version}.tmp')
+        shutil.rmtree(temp_root, ignore_errors=True)
+        os.makedirs(temp_root)
+
+        for name, values in data.items():
+            with open(self._get_path(name, temp_root), 'wb') as file:
+                file.write(values if isinstance(values, bytes) else values.tobytes())
+                file.flush()
+                os.fsync(file.fileno())
+        self._write_meta({'types': types}, temp_root)
+
+        version_root = os.path.join(self.path, version)
+        shutil.rmtree(version_root, ignore_errors=True)
+        os.replace(temp_root, version_root)
+        sync_directory(version_root)
+
+        pointer_path = os.path.join(self.path, 'current')
+        with open(f'{pointer_path}.tmp', 'w', encoding='ascii') as file:
+            file.write(version)
+            file.flush()
+            os.fsync(file.fileno())
+        os.replace(f'{pointer_path}.tmp', pointer_path)
+        sync_directory(pointer_path)
+
+        # Versions older than the previous one and leftovers of interrupted writes are no longer read by anyone
+        for name in os.listdir(self.path):
+            if name.startswith('v') and name not in (version, previous):
+                shutil.rmtree(os.path.join(self.path, name), ignore_errors=True)
+
+
+class FrameTable:
+    """Table loaded into memory as a DataFrame."""
+
+    def __init__(self, frame: pd.DataFrame):
+        self._frame = frame
+        # Records appended to the table that are not merged into the DataFrame yet
+        self._pending = []
+
+    def __len__(self) -> int:
+        return len(self._frame.index) + sum(len(frame.index) for frame in self._pending)
+
+    @property
+    def frame(self) -> pd.DataFrame:
+        # Appended records are merged in one step instead of enlarging the table row by row
+        if self._pending:
+            appended = pd.concat(self._pending).astype(self._frame.dtypes.to_dict())
+            appended.index.name = self._frame.index.name
+            self._frame = pd.concat([self._frame, appended])
+            self._pending = []
+
+        return self._frame
+
+    @property
+    def keys(self) -> pd.Index:
+        return self.frame.index
+
+    def column(self, field: str, positions: np.ndarray = None) -> np.ndarray:
+        """
+        Returns a whole column (or only the given positions of it) ready for comparisons. Dates are returned parsed.
+        The rows are taken before the dates are parsed, so only they are parsed.
+        """
+        values = self.frame[field].to_numpy()
+        if positions is not None:
+            values = values[positions]
+        return parse_dates(values) if field == 'date' else values
+
+    def evaluate(self, condition: Condition, positions: np.ndarray = None) -> np.ndarray:
+        """Returns a boolean mask of the rows at the given positions (or of all rows) satisfying the condition."""
+        return condition.evaluate(self.column(condition.field, positions))
+
+    def take(self, positions: np.ndarray) -> pd.DataFrame:
+        return self.frame.iloc[positions]
+
+    def get_rows(self, keys: pd.Index) -> pd.DataFrame:
+        return self.frame.loc[keys]
+
+    def locate(self, keys: pd.Index) -> np.ndarray:
+        """Finds positions of the given keys, -1 for the keys that are not in the table."""
+        return self.frame.index.get_indexer(keys)
+
+    def append(self, frame: pd.DataFrame) -> None:
+        self._pending.append(frame)
+
+    def apply_changes(self, changes: pd.DataFrame) -> None:
+        """Replaces the rows with the same keys. The change log may contain keys that are not in the table."""
+        frame = self.frame
+        changes = changes[changes.index.isin(frame.index)]
+        frame.loc[changes.index, changes.columns] = changes.astype(frame.dtypes.to_dict())
+
+    def to_frame(self) -> pd.DataFrame:
+        return self.frame
+
+
+class MappedTable:
+    """
+    Table of the columnar backend that is never loaded as a whole.
+    Columns are paged in by np.memmap only when a query or an aggregate touches them,
+    and descriptions are decoded only for the rows that are actually taken.
+
+    Records changed by the change log are kept in a small DataFrame that overrides the mapped rows.
+    """
+
+    def __init__(self, backend: 'ColumnarBackend'):
+        self.backend = backend
+        self.rows = backend.rows
+        self.types = backend.read_meta()['types']
+
+        self.changes = None
+        self.changed_positions = np.empty(0, dtype=np.int64)
+
+    def __len__(self) -> int:
+        return self.rows
+
+    def _map(self, name: str) -> np.ndarray:
+        return self.backend.map_column(name, self.rows)
+
+    @property
+    def keys(self) -> pd.Index:
+        return pd.Index(self._map('pk'), name='pk')
+
+    def _get_values(self, field: str, positions: np.ndarray = None) -> np.ndarray:
+        """Reads the column (or only the given positions of it) without the change log applied."""
+        if field == 'descr':
+            return self.backend.decode_descr(np.arange(self.rows) if positions is None else positions)
+
+        values = self._map(field)
+        if positions is not None:
+            values = values[positions]
+
+        if field == 'date':
+            dates = values.astype('datetime64[D]')
+            dates[values == self.backend.no_date] = np.datetime64('NaT')
+            return dates
+        if field == 'type':
+            codes = np.where(values == self.backend.no_type, -1, values.astype(np.int16))
+            return pd.Categorical.from_codes(codes, categories=self.types)
+        return values
+
+    def column(self, field: str) -> np.ndarray:
+        """Returns a whole column ready for comparisons. Dates are returned parsed."""
+        values = self._get_values(field)
+
+        if self.changes is not None and field in self.changes:
+            values = np.array(values, dtype=object if field == 'type' else None)
+            values[self.changed_positions] = FrameTable(self.changes).column(field)
+        return values
+
+    def evaluate(self, condition: Condition, positions: np.ndarray = None) -> np.ndarray:
+        """Returns a boolean mask of the rows at the given positions (or of all rows) satisfying the condition."""
+        if condition.field == 'descr' and condition.operation == '==':
+            mask = self.backend.descr_equals(condition.value, positions)
+        else:
+            mask = condition.evaluate(self._get_values(condition.field, positions))
+
+        # Rows overridden by the change log are checked against their new values
+        if self.changes is not None:
+            if positions is None:
+                slots = self.changed_positions
+            else:
+                slots = np.flatnonzero(np.isin(positions, self.changed_positions))
+            if len(slots):
+                targets = slots if positions is None else positions[slots]
+                changed = FrameTable(self.changes.loc[self.keys[targets]])
+                mask[slots] = changed.evaluate(condition)
+
+        return mask
+
+    def take(self, positions: np.ndarray) -> pd.DataFrame:
+        """Builds a DataFrame of the rows at the given positions, decoding only their descriptions."""
+        dates = self._get_values('date', positions)
+        # Missing dates stay missing instead of turning into "NaT" strings, as in ColumnarBackend.read()
+        strings = np.datetime_as_string(dates, unit='D').astype(object)
+        strings[np.isnat(dates)] = np.nan
+
+        frame = pd.DataFrame({
+            'date': strings,
+            'type': np.asarray(self._get_values('type', positions), dtype=object),
+            'amount': self._get_values('amount', positions),
+            'descr': self._get_values('descr', positions),
+        }, index=self.keys[positions])
+
+        if self.changes is not None:
+            changed = frame.index.intersection(self.changes.index)
+            frame.loc[changed] = self.changes.loc[changed, frame.columns]
+        return frame
+
+    def get_rows(self, keys: pd.Index) -> pd.DataFrame:
+        return self.take(self.locate(keys))
+
+    def locate(self, keys: pd.Index) -> np.ndarray:
+        """Finds positions of the given keys. Keys are allocated in increasing order, so binary search is enough."""
+        pks = self._map('pk')
+        positions = np.searchsorted(pks, keys)
+        positions = np.minimum(positions, max(self.rows - 1, 0))
+
+        if self.rows and not np.array_equal(pks[positions], keys):
+            positions = self.keys.get_indexer(keys)
+        return positions
+
+    def append(self, frame: pd.DataFrame) -> None:
+        # The records are already written to the column files, they only have to become visible
+        self.rows += len(frame.index)
+        self.types = self.backend.read_meta()['types']
+
+    def apply_changes(self, changes: pd.DataFrame) -> None:
+        changes = changes.astype({'amount': np.int64})
+        if self.changes is not None:
+            changes = pd.concat([self.changes, changes])
+            changes = changes[~changes.index.duplicated(keep='last')]
+
+        positions = self.locate(changes.index)
+        known = positions >= 0
+        self.changes = changes[known]
+        self.changed_positions = positions[known]
+
+    def to_frame(self) -> pd.DataFrame:
+        return self.take(np.arange(self.rows))
+
+
+# Storage formats, chosen by the extension of the database path
+backends = {
+    '.csv': CsvBackend,
+    '.ledger': ColumnarBackend,
+}
+
+
+def get_backend(path: str) -> AbstractBackend:
+    return backends.get(os.path.splitext(path)[1], CsvBackend)(path)
+
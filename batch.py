@@ -0,0 +1,155 @@
+import re
+import sys
+from typing import Iterable
+
+import numpy as np
+import pandas as pd
+
+from handlers import AddNoteHandler, FindNotesHandler, FieldAttrs
+from instrumentation import instrumentation
+from languages import LanguagePack
+from queries import Condition, operations
+from signals import InvalidInputSignal
+from storage import LedgerStore
+
+# A filter condition written as "field<operation>value", e.g. "amount>=100"
+condition_regex = re.compile(r'(\w+)\s*({})\s*(.*)'.format('|'.join(
+    re.escape(operation) for operation in sorted(operations, key=len, reverse=True)
+)))
+# An argument of the add command written as "field=value". The value may be quoted to keep its spaces
+value_regex = re.compile(r"""\s*(\w+)=(?:"([^"]*)"|'([^']*)'|([^\s"']*))(?=\s|$)""")
+
+
+def parse_values(arguments: str) -> dict[str, str]:
+    """Parses the arguments of the add command: "date=2024-01-01 type=income amount=100 descr='Salary'"."""
+    values = {}
+    position, end = 0, len(arguments.rstrip())
+
+    while position < end:
+        match = value_regex.match(arguments, position)
+        if not match:
+            raise InvalidInputSignal('input_error', arguments[position:].split()[0])
+
+        field, double_quoted, single_quoted, plain = match.groups()
+        values[field] = next(value for value in (double_quoted, single_quoted, plain) if value is not None)
+        position = match.end()
+
+    return values
+
+
+def parse_conditions(arguments: str) -> list[Condition]:
+    """Parses the arguments of the find command: "amount>100 & type==income"."""
+    conditions = []
+    for part in arguments.split('&'):
+        match = condition_regex.fullmatch(part.strip())
+        if not match:
+            raise InvalidInputSignal('operator_err', part.strip())
+
+        field, operation, value = match.groups()
+        # A value may be quoted to keep its spaces
+        if len(value) > 1 and value[0] == value[-1] and value[0] in ('"', "'"):
+            value = value[1:-1]
+        conditions.append(Condition(field, operation, value))
+
+    return conditions
+
+
+class BatchRunner:
+    """
+    Executes commands read from a file or from the standard input, without prompting the user.
+    Values are checked by the same handlers and validators as in the interactive mode.
+
+    Added records are collected and written to the database in one pass: before the next find,
+    so it sees them, and at the end of the batch. Their values are checked at the same time,
+    column by column. Records are rejected only then, while unknown commands are rejected at once,
+    so the rejected lines are collected and reported at the end of the batch in the order of the lines.
+    """
+
+    def __init__(self, language: LanguagePack, fields: dict[str, FieldAttrs], store: LedgerStore):
+        self.language = language
+        self.fields = fields
+        self.store = store
+        self.add_handler = AddNoteHandler(language, fields, store)
+        self.find_handler = FindNotesHandler(language, fields, store)
+
+        # Number of the line being executed
+        self.line = 0
+        # Records that are not checked and written yet and the numbers of their lines
+        self.pending = []
+        self.pending_lines = []
+        self.added = 0
+        # Numbers of the rejected lines and their errors
+        self.rejections = []
+
+    def add(self, arguments: str) -> None:
+        self.pending.append(self.add_handler.check_fields(parse_values(arguments)))
+        self.pending_lines.append(self.line)
+
+    def find(self, arguments: str) -> None:
+        # The records added before the query have to be visible to it
+        self.commit()
+
+        positions = self.find_handler.find(parse_conditions(arguments))
+        if not len(positions):
+            print(self.language.get('bad_query'))
+            return
+
+        print(self.language.get('n_notes_found').format(number=len(positions)))
+        self.find_handler.pprint_many(self.store.take(positions), fields=self.fields, language=self.language)
+
+    def commit(self) -> None:
+        """Checks all collected records and writes the valid ones at once."""
+        if not self.pending:
+            return
+
+        frame = pd.DataFrame.from_records(self.pending, columns=list(self.fields))
+        failed_fields = self.add_handler.check_entities(frame)
+        valid = np.equal(failed_fields, None)
+
+        for line, field in zip(np.asarray(self.pending_lines)[~valid], failed_fields[~valid]):
+            self.reject(line, InvalidInputSignal('input_error', field))
+
+        if valid.any():
+            self.store.append_many(frame[valid])
+            self.added += int(np.count_nonzero(valid))
+        self.pending = []
+        self.pending_lines = []
+
+    def reject(self, line: int, error: InvalidInputSignal) -> None:
+        self.rejections.append((line, error))
+
+    def report_rejections(self) -> None:
+        for line, error in sorted(self.rejections, key=lambda rejection: rejection[0]):
+            print(self.language.get('line_rejected').format(
+                line=line, err_code=error.err_code, field=error.field
+            ), file=sys.stderr)
+
+    def run(self, lines: Iterable[str]) -> int:
+        """Executes the commands line by line. Returns the number of rejected lines, which are reported to stderr."""
+        for number, line in enumerate(lines, start=1):
+            self.line = number
+            line = line.strip()
+            if not line or line.startswith('#'):  # Empty lines and comments
+                continue
+
+            command, _, arguments = line.partition(' ')
+            try:
+                if command not in batch_commands:
+                    raise InvalidInputSignal('notfound_command', command)
+                with instrumentation.command(command):
+                    batch_commands[command](self, arguments)
+            except InvalidInputSignal as error:
+                self.reject(number, error)
+
+        self.commit()
+        self.report_rejections()
+        print(self.language.get('batch_done').format(added=self.added, rejected=len(self.rejections)),
+              file=sys.stderr)
+        return len(self.rejections)
+
+
+# Commands available in the batch mode. The dictionary key is the first word of a line
+batch_commands = {
+    'add': BatchRunner.add,
+    'find': BatchRunner.find,
+}
@@ -0,0 +1,200 @@
+"""
+Stress test of several processes working with the same database.
+
+    python benchmarks/concurrency.py --writers 4 --readers 2 --operations 200 --format csv
+
+Writers add records and, in turns, change different fields of one shared record. The last change of every writer
+sets a marker value. Readers keep re-reading the table meanwhile. Checkpoints are made frequent on purpose,
+so the file is replaced under the readers many times.
+
+The test fails (exit code 1) if:
+- a reader sees duplicate keys, fewer records than before or the records of a writer out of order
+  (the record j of a writer without its record j - 1), i.e. a read that is not a consistent snapshot;
+- any added record is missing or duplicated at the end;
+- a change of the shared record is lost: its fields must hold the marker of one of the writers that changed them;
+- the cached statistics do not match the records.
+"""
+import argparse
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+root_path = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, root_path)
+
+# The record of the sample database changed by all writers, and the field changed by every writer
+shared_key = 0
+changed_fields = ('descr', 'amount', 'date')
+
+# Descriptions of the added records: the writer and the number of the record
+added_pattern = r'^add-(\d+)-(\d+)$'
+
+
+def get_marker(field: str, writer: int) -> str | int:
+    """The value the writer sets last."""
+    values = {'descr': f'final-{writer}', 'amount': 1_000_000 + writer, 'date': f'2031-01-{writer % 28 + 1:02d}'}
+    return values[field]
+
+
+def get_value(field: str, writer: int, number: int) -> str | int:
+    values = {
+        'descr': f'w{writer}-{number}', 'amount': 1000 * writer + number, 'date': f'2030-01-{number % 28 + 1:02d}',
+    }
+    return values[field]
+
+
+def run_writer(database_path: str, writer: int, operations: int) -> dict:
+    import pandas as pd
+    from storage import LedgerStore
+
+    store = LedgerStore(database_path)
+    field = changed_fields[writer % len(changed_fields)]
+    started = time.perf_counter()
+
+    for number in range(operations):
+        store.append({'date': '2024-06-15', 'type': 'income', 'amount': number + 1, 'descr': f'add-{writer}-{number}'})
+        if number % 2:
+            store.update(pd.Index([shared_key]), {field: get_value(field, writer, number)})
+    store.update(pd.Index([shared_key]), {field: get_marker(field, writer)})
+
+    return {'commits': operations + operations // 2 + 1, 'seconds': time.perf_counter() - started}
+
+
+def get_added(frame):
+    """Writers and numbers of the added records found in the table."""
+    return frame.descr.dropna().astype(str).str.extract(added_pattern).dropna().astype(int)
+
+
+def check_snapshot(frame) -> str | None:
+    """Returns the description of the first inconsistency of the read table."""
+    if not frame.index.is_unique:
+        return 'duplicate keys'
+
+    for writer, numbers in get_added(frame).groupby(0)[1]:
+        if sorted(numbers) != list(range(len(numbers))):
+            return f'records of writer {writer} are not a prefix of its commits'
+    return None
+
+
+def run_reader(database_path: str, done_path: str) -> dict:
+    from storage import LedgerStore
+
+    store = LedgerStore(database_path)
+    reads, previous, errors = 0, 0, []
+
+    while not os.path.exists(done_path):
+        frame = store.load()
+        reads += 1
+
+        error = check_snapshot(frame)
+        if len(frame) < previous:
+            error = f'{len(frame)} records after {previous}'
+        if error:
+            errors.append(error)
+        previous = len(frame)
+
+    return {'reads': reads, 'errors': errors[:10]}
+
+
+def verify(database_path: str, writers: int, operations: int, initial: int) -> list[str]:
+    """Checks the final state of the database."""
+    from storage import LedgerStore
+
+    store = LedgerStore(database_path)
+    frame = store.load()
+    errors = []
+
+    if len(frame) != initial + writers * operations:
+        errors.append(f'{len(frame)} records instead of {initial + writers * operations}')
+    added = get_added(frame)
+    duplicated = int(added.duplicated().sum())
+    if duplicated or len(added) != writers * operations:
+        errors.append(f'{len(added)} added records, {duplicated} of them duplicated')
+
+    shared = frame.loc[shared_key]
+    for index, field in enumerate(changed_fields):
+        markers = [get_marker(field, writer) for writer in range(index, writers, len(changed_fields))]
+        if markers and shared[field] not in markers:
+            errors.append(f'the change of "{field}" was lost: {shared[field]!r} is not one of {markers}')
+
+    statistic = store.statistic()
+    for type_, amount in frame.groupby('type').amount.sum().items():
+        if statistic.get_total(type_) != amount:
+            errors.append(f'statistics of "{type_}": {statistic.get_total(type_)} instead of {amount}')
+    return errors
+
+
+def spawn(*arguments: str) -> subprocess.Popen:
+    return subprocess.Popen(
+        [sys.executable, os.path.abspath(__file__), *arguments], stdout=subprocess.PIPE, text=True
+    )
+
+
+def run_test(writers: int, readers: int, operations: int, database_format: str, checkpoint_size: int) -> bool:
+    from storage import LedgerStore
+
+    with tempfile.TemporaryDirectory() as directory:
+        database_path = os.path.join(directory, f'database.{database_format}')
+        sample_path = os.path.join(root_path, 'database.csv')
+        if database_format == 'csv':
+            shutil.copy(sample_path, database_path)
+        else:
+            LedgerStore(sample_path).export(database_path)
+        initial = len(LedgerStore(database_path).load())
+
+        done_path = os.path.join(directory, 'done')
+        common = [
+            '--database', database_path, '--operations', str(operations), '--checkpoint-size', str(checkpoint_size),
+        ]
+        started = time.perf_counter()
+
+        reader_processes = [spawn('--reader', done_path, *common) for _ in range(readers)]
+        writer_processes = [spawn('--writer', str(writer), *common) for writer in range(writers)]
+        writer_results = [json.loads(process.communicate()[0]) for process in writer_processes]
+        elapsed = time.perf_counter() - started
+
+        open(done_path, 'w').close()
+        reader_results = [json.loads(process.communicate()[0]) for process in reader_processes]
+
+        commits = sum(result['commits'] for result in writer_results)
+        print(f'{writers} writers: {commits} commits in {elapsed:.2f} s ({commits / elapsed:.0f} commits/s)')
+        print(f'{readers} readers: {sum(result["reads"] for result in reader_results)} snapshots read')
+
+        errors = [error for result in reader_results for error in result['errors']]
+        errors += verify(database_path, writers, operations, initial)
+
+    for error in errors:
+        print(f'FAILED: {error}', file=sys.stderr)
+    if not errors:
+        print('OK')
+    return not errors
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Several processes adding, changing and reading the same database')
+    parser.add_argument('--writers', type=int, default=4, help='number of writing processes')
+    parser.add_argument('--readers', type=int, default=2, help='number of reading processes')
+    parser.add_argument('--operations', type=int, default=200, help='number of records added by every writer')
+    parser.add_argument('--format', choices=['csv', 'ledger'], default='csv', dest='database_format')
+    parser.add_argument('--checkpoint-size', type=int, default=16 * 1024,
+                        help='size of the write-ahead log that triggers a checkpoint, small to make them frequent')
+    parser.add_argument('--writer', type=int, help=argparse.SUPPRESS)
+    parser.add_argument('--reader', metavar='DONE_PATH', help=argparse.SUPPRESS)
+    parser.add_argument('--database', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.writer is not None or args.reader:
+        from storage import LedgerStore
+        LedgerStore.checkpoint_min_size = args.checkpoint_size
+
+        if args.reader:
+            print(json.dumps(run_reader(args.database, args.reader)))
+        else:
+            print(json.dumps(run_writer(args.database, args.writer, args.operations)))
+    else:
+        sys.exit(0 if run_test(args.writers, args.readers, args.operations, args.database_format,
+                               args.checkpoint_size) else 1)
@@ -0,0 +1,317 @@
+"""
+Measures how the commands scale with the size of the database.
+
+    python benchmarks/scaling.py --sizes 1000 100000 1000000 --format csv ledger --output results.json
+    python benchmarks/scaling.py --compare old.json new.json
+
+For every size a synthetic ledger with the schema of database.csv is generated in a temporary directory,
+with descriptions in several scripts, as in the sample database. The handlers of the commands are then driven
+with scripted answers instead of a terminal, their output is discarded.
+
+Every operation runs in its own process, so its peak memory is not inflated by the previous ones.
+For every operation the latency of the first run (which includes opening the table), the median, minimum and
+maximum latency, the throughput in operations and in rows of the ledger per second and the peak RSS are reported.
+"""
+import argparse
+import builtins
+import json
+import os
+import platform
+import resource
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from contextlib import redirect_stdout
+from datetime import datetime
+from typing import Callable
+
+root_path = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, root_path)
+
+# Descriptions of the generated records, the non-ASCII ones check that encoding does not slow anything down
+descriptions = (
+    'Salary', 'Birthday gift', 'Привет', 'Продукты', 'Кофе с друзьями', 'Café', 'Rent', '東京 trip', 'Donate',
+)
+
+# The generated records are dated within these three years
+first_date, days = '2022-01-01', 1096
+
+# Rows of the ledger generated and written at once
+chunk_size = 1_000_000
+
+
+def generate(path: str, rows: int, seed: int = 0) -> None:
+    """Writes a CSV ledger with the given number of random records. The same seed gives the same ledger."""
+    import numpy as np
+    import pandas as pd
+
+    rng = np.random.default_rng(seed)
+    with open(path, 'w', encoding='utf-8', newline='') as file:
+        for start in range(0, max(rows, 1), chunk_size):
+            count = min(chunk_size, rows - start)
+            pd.DataFrame({
+                'pk': np.arange(start, start + count),
+                'date': np.datetime_as_string(np.datetime64(first_date) + rng.integers(0, days, count)),
+                'type': np.array(['income', 'expense'])[rng.integers(0, 2, count)],
+                'amount': rng.integers(1, 10_001, count),
+                'descr': np.array(descriptions, dtype=object)[rng.integers(0, len(descriptions), count)],
+            }).to_csv(file, header=start == 0, index=False, lineterminator='\n')
+
+
+def get_peak_rss() -> float:
+    """Peak resident memory of this process in megabytes."""
+    # On Linux getrusage() keeps the peak of the parent process across fork and exec,
+    # while the high water mark of /proc belongs to the memory of this process only
+    try:
+        with open('/proc/self/status', encoding='ascii') as status:
+            for line in status:
+                if line.startswith('VmHWM:'):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+
+    # macOS reports bytes
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024 if sys.platform == 'darwin' else 1024)
+
+
+def drive(handler, answers: list[str]):
+    """
+    Runs the handler, answering its prompts with the given values in order.
+    Lists of records are not paged through: the first page is shown and the pager is stopped.
+    """
+    from signals import ExitSignal
+
+    pager_prompt = handler.language['page_navigation'].partition('{')[0]
+    scripted = iter(answers)
+
+    def scripted_input(message: str = '') -> str:
+        if message.startswith(pager_prompt):
+            return 'stop'
+        try:
+            return next(scripted)
+        except StopIteration:
+            raise RuntimeError(f'No answer is scripted for the prompt: {message!r}') from None
+
+    builtins.input = scripted_input
+    try:
+        return handler.operate()
+    except ExitSignal:  # Commands that loop until "exit" are left this way
+        return None
+
+
+def prepare_load(store, language, rows: int, number: int) -> Callable[[], None]:
+    from storage import LedgerStore
+
+    # Every run reads the ledger anew
+    return lambda: LedgerStore(store.path).load()
+
+
+def prepare_show(store, language, rows: int, number: int) -> Callable[[], None]:
+    from handlers import ShowStatisticHandler, database_fields
+
+    handler = ShowStatisticHandler(language, database_fields, store)
+    return lambda: drive(handler, ['No', 'Income', 'exit'])
+
+
+def prepare_report(store, language, rows: int, number: int) -> Callable[[], None]:
+    from handlers import ShowStatisticHandler, database_fields
+
+    # Balances of every week of the generated years
+    handler = ShowStatisticHandler(language, database_fields, store)
+    return lambda: drive(handler, ['Week', 'all', 'exit'])
+
+
+def prepare_add(store, language, rows: int, number: int) -> Callable[[], None]:
+    from handlers import AddNoteHandler, database_fields
+
+    handler = AddNoteHandler(language, database_fields, store)
+    answers = ['2024-06-15', 'Expense', str(100 + number), descriptions[number % len(descriptions)]]
+    return lambda: drive(handler, answers)
+
+
+def prepare_find(store, language, rows: int, number: int) -> Callable[[], None]:
+    from handlers import FindNotesHandler, database_fields
+
+    # About one percent of the records by amount, narrowed down by type
+    handler = FindNotesHandler(language, database_fields, store)
+    return lambda: drive(handler, ['Amount', '>=', '9900', 'yes', 'Type', '==', 'Income', 'no'])
+
+
+def prepare_find_descr(store, language, rows: int, number: int) -> Callable[[], None]:
+    from handlers import FindNotesHandler, database_fields
+
+    handler = FindNotesHandler(language, database_fields, store)
+    return lambda: drive(handler, ['Description', '==', 'Привет', 'no'])
+
+
+def prepare_find_words(store, language, rows: int, number: int) -> Callable[[], None]:
+    from handlers import FindNotesHandler, database_fields
+
+    # Records with a word of a description and a word starting with a prefix, answered by the text index
+    handler = FindNotesHandler(language, database_fields, store)
+    return lambda: drive(handler, ['Description', '~=', 'друзьями', 'yes', 'Description', '^=', 'коф', 'no'])
+
+
+def prepare_change(store, language, rows: int, number: int) -> Callable[[], None]:
+    import numpy as np
+    from handlers import ChangeNotesHandler, database_fields
+
+    # A record spread over the ledger is found by its date and amount, which selects only a few records.
+    # It is read before the measurement, so the first run does not include opening the table
+    record = store.take(np.array([number * 7919 % rows])).iloc[0]
+    answers = [
+        'Date', '==', str(record['date'])[:10], 'yes', 'Amount', '==', str(record['amount']), 'no',
+        'Description', 'no', f'{record["descr"]} ✓',
+    ]
+    handler = ChangeNotesHandler(language, database_fields, store)
+    return lambda: drive(handler, answers)
+
+
+# Measured operations, in the order they are run. Each function prepares one run and returns it
+operations = {
+    'load': prepare_load,
+    'show': prepare_show,
+    'report': prepare_report,
+    'find': prepare_find,
+    'find_descr': prepare_find_descr,
+    'find_words': prepare_find_words,
+    'add': prepare_add,
+    'change': prepare_change,
+}
+
+
+def measure(operation: str, database_path: str, rows: int, repeat: int) -> dict:
+    """Runs the operation several times in this process and returns its timings."""
+    from languages import default_language, load_language
+    from storage import LedgerStore
+
+    language = load_language(default_language)
+    store = LedgerStore(database_path)
+    baseline_rss = get_peak_rss()
+
+    timings = []
+    with open(os.devnull, 'w', encoding='utf-8') as devnull, redirect_stdout(devnull):
+        for number in range(repeat):
+            run = operations[operation](store, language, rows, number)
+            started = time.perf_counter()
+            run()
+            timings.append(time.perf_counter() - started)
+
+    median = statistics.median(timings)
+    return {
+        'rows': rows,
+        'operation': operation,
+        'repeat': repeat,
+        'first_ms': timings[0] * 1000,
+        'median_ms': median * 1000,
+        'min_ms': min(timings) * 1000,
+        'max_ms': max(timings) * 1000,
+        'ops_per_s': repeat / sum(timings),
+        'rows_per_s': rows / median if median else None,
+        'baseline_rss_mb': baseline_rss,
+        'peak_rss_mb': get_peak_rss(),
+    }
+
+
+def measure_in_process(operation: str, database_path: str, rows: int, repeat: int) -> dict:
+    """Runs measure() in a new interpreter, so the peak memory belongs to this operation only."""
+    completed = subprocess.run(
+        [sys.executable, os.path.abspath(__file__), '--worker', operation, '--database', database_path,
+         '--rows', str(rows), '--repeat', str(repeat)],
+        stdout=subprocess.PIPE, check=True, text=True,
+    )
+    return json.loads(completed.stdout)
+
+
+def get_revision() -> str | None:
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], cwd=root_path, capture_output=True, check=True, text=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run_suite(sizes: list[int], formats: list[str], repeat: int) -> dict:
+    import numpy as np
+    import pandas as pd
+    from storage import LedgerStore
+
+    results = []
+    for rows in sizes:
+        with tempfile.TemporaryDirectory() as directory:
+            csv_path = os.path.join(directory, f'ledger-{rows}.csv')
+            generate(csv_path, rows)
+
+            for database_format in formats:
+                database_path = os.path.join(directory, f'ledger-{rows}.{database_format}')
+                if database_format != 'csv':
+                    LedgerStore(csv_path).export(database_path)
+
+                for operation in operations:
+                    result = {'format': database_format, **measure_in_process(operation, database_path, rows, repeat)}
+                    print_result(result)
+                    results.append(result)
+
+    return {
+        'created': datetime.now().isoformat(timespec='seconds'),
+        'revision': get_revision(),
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'pandas': pd.__version__,
+        'platform': platform.platform(),
+        'results': results,
+    }
+
+
+def print_result(result: dict) -> None:
+    print(
+        f'{result["format"]:>6} {result["rows"]:>10} {result["operation"]:<10} '
+        f'first {result["first_ms"]:9.1f} ms  median {result["median_ms"]:9.1f} ms  '
+        f'{result["ops_per_s"]:9.1f} op/s  peak {result["peak_rss_mb"]:7.1f} MB'
+    )
+
+
+def compare(old_path: str, new_path: str) -> None:
+    """Prints the ratio of the median latency and of the peak memory of two saved runs."""
+    def read(path: str) -> dict:
+        with open(path, encoding='utf-8') as file:
+            return {(result['format'], result['rows'], result['operation']): result for result in json.load(file)['results']}
+
+    old, new = read(old_path), read(new_path)
+    for key in sorted(old.keys() & new.keys(), key=lambda key: (key[0], key[1], list(operations).index(key[2]))):
+        database_format, rows, operation = key
+        print(
+            f'{database_format:>6} {rows:>10} {operation:<10} '
+            f'median {old[key]["median_ms"]:9.1f} -> {new[key]["median_ms"]:9.1f} ms '
+            f'(x{new[key]["median_ms"] / old[key]["median_ms"]:.2f})  '
+            f'peak {old[key]["peak_rss_mb"]:7.1f} -> {new[key]["peak_rss_mb"]:7.1f} MB'
+        )
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Latency, throughput and memory of the commands by database size')
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1_000, 10_000, 100_000, 1_000_000, 10_000_000],
+                        help='numbers of records of the generated ledgers')
+    parser.add_argument('--format', nargs='+', choices=['csv', 'ledger'], default=['csv'], dest='formats',
+                        help='storage formats to measure')
+    parser.add_argument('--repeat', type=int, default=5, help='number of runs of every operation')
+    parser.add_argument('--output', metavar='PATH', help='save the results as JSON')
+    parser.add_argument('--compare', nargs=2, metavar=('OLD', 'NEW'), help='compare two saved results and exit')
+    parser.add_argument('--worker', choices=operations, help=argparse.SUPPRESS)
+    parser.add_argument('--database', help=argparse.SUPPRESS)
+    parser.add_argument('--rows', type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.compare:
+        compare(*args.compare)
+    elif args.worker:
+        print(json.dumps(measure(args.worker, args.database, args.rows, args.repeat)))
+    else:
+        report = run_suite(args.sizes, args.formats, args.repeat)
+        if args.output:
+            with open(args.output, 'w', encoding='utf-8') as file:
+                json.dump(report, file, indent=2, ensure_ascii=False)
@@ -0,0 +1,48 @@
+"""
+Measures the time from the start of the program to its first prompt.
+
+    python benchmarks/startup.py --runs 20 --max-ms 300
+
+The program is started with a piped standard input, the time is taken when the first bytes of the prompt
+appear on its standard output. Exits with code 1 if the median time exceeds --max-ms.
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+main_path = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'main.py')
+
+
+def measure_once() -> float:
+    """Returns the number of milliseconds before the first prompt."""
+    started = time.perf_counter()
+    process = subprocess.Popen(
+        [sys.executable, '-u', main_path], stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL
+    )
+    try:
+        if not os.read(process.stdout.fileno(), 1):
+            raise RuntimeError('the program exited without a prompt')
+        return (time.perf_counter() - started) * 1000
+    finally:
+        process.kill()
+        process.wait()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Time to the first prompt')
+    parser.add_argument('--runs', type=int, default=10, help='number of measured starts')
+    parser.add_argument('--max-ms', type=float, help='fail if the median time exceeds this number of milliseconds')
+    args = parser.parse_args()
+
+    # The first start warms up the file system cache and the bytecode of the modules
+    measure_once()
+    timings = [measure_once() for _ in range(args.runs)]
+    median = statistics.median(timings)
+    print(f'first prompt: min {min(timings):.1f} ms, median {median:.1f} ms over {args.runs} runs')
+
+    if args.max_ms is not None and median > args.max_ms:
+        print(f'median exceeds {args.max_ms:.1f} ms', file=sys.stderr)
+        sys.exit(1)
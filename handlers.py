@@ -1,13 +1,22 @@
-from typing import Optional, TypeVar, NamedTuple, Type
+from __future__ import annotations
 
-import pandas as pd
+import sys
+from typing import Iterator, Optional, TypeVar, NamedTuple, Type, TYPE_CHECKING
 
-from languages import get_lang_codes, registered_languages
-from signals import ExitSignal
-from utils import PrettyPrintMixin, translate_dict
+from instrumentation import instrumentation
+from languages import LanguagePack, get_lang_codes, load_language
+from queries import Condition, Query
+from signals import ExitSignal, InvalidInputSignal
+from utils import PrettyPrintMixin, paginate, translate_dict
 from validators import *
 
-pd.set_option('display.max_columns', None)
+# The handlers only pass data between the user and the store. pandas and numpy are loaded by the store
+# on the first access to the data, so the prompts appear without waiting for them
+if TYPE_CHECKING:
+    import numpy as np
+    import pandas as pd
+    from indexes import Aggregates
+    from storage import LedgerStore
 
 # Common class for all validators
 Validator = TypeVar('Validator', bound=AbstractValidator)
@@ -22,39 +31,40 @@ class FieldAttrs(NamedTuple):
     validator_arg_code: str
     # Key for receiving the message that needs to be displayed when entering a field value
     input_message: str
-    # Form for composing a query request when filtering
-    query_form: str
+
+    def get_validator(self, language: LanguagePack) -> Optional[AbstractValidator]:
+        """Creates the validator of the field values. A field may not have a validator class."""
+        if not self.validator_class:
+            return None
+        return self.validator_class(language.get(self.validator_arg_code), err_code='input_error')
 
 
 # Database configuration
 database_fields = {
     'date': FieldAttrs(
         operations=('==', '>', '>=', '<', '<='),
-        validator_class=RegExValidator,
+        validator_class=DateValidator,
         validator_arg_code='date_regex',
-        input_message='date_input',
-        query_form='{main_arg}{operation}"{sub_arg}"'
+        input_message='date_input'
     ),
     'type': FieldAttrs(
         operations=('==',),
         validator_class=ValueInValidator,
         validator_arg_code='values_for_type',
-        input_message='type_input',
-        query_form='{main_arg}{operation}"{sub_arg}"'
+        input_message='type_input'
     ),
     'amount': FieldAttrs(
         operations=('==', '>', '>=', '<', '<='),
         validator_class=TypeValidator,
         validator_arg_code='amount_type',
-        input_message='amount_input',
-        query_form='{main_arg}{operation}{sub_arg}'
+        input_message='amount_input'
     ),
     'descr': FieldAttrs(
-        operations=('==',),
+        # Besides the whole description, records are found by its words ("~=") or by their beginnings ("^=")
+        operations=('==', '~=', '^='),
         validator_class=None,
         validator_arg_code=None,
-        input_message='descr_input',
-        query_form='{main_arg}{operation}"{sub_arg}"'
+        input_message='descr_input'
     ),
 
 }
@@ -64,7 +74,7 @@ database_fields = {
 class AbstractHandler(ABC):
     """Implements the abstract method "operate" and a protected method "_get_command"."""
 
-    def __init__(self, language: dict[str, str | dict]):
+    def __init__(self, language: LanguagePack):
         self.language = language
 
     @abstractmethod
@@ -81,19 +91,50 @@ class AbstractHandler(ABC):
         If the user enters "exit", it will throw an error "ExitSignal",
         which will interrupt the input at any stage of the program.
         """
-        user_entered = input(message).strip()
+        # Waiting for the user is not counted as the time of the command
+        with instrumentation.span('input'):
+            user_entered = input(message).strip()
 
         while validator and not validator.validate(user_entered) or user_entered == 'exit':
             if user_entered == 'exit':
                 raise ExitSignal
 
-            user_entered = input(self.language.get(validator.err_code)).strip()
+            with instrumentation.span('input'):
+                user_entered = input(self.language.get(validator.err_code)).strip()
 
         return user_entered
 
 
+class PagerMixin(PrettyPrintMixin):
+    """Displays a list of records page by page. Only the records of the shown page are read and formatted."""
+
+    # Maximum number of records on a page
+    page_size = 20
+
+    def _show_pages(self, positions) -> None:
+        """Shows the records at the given positions of the table, the user moves between pages with next/prev."""
+        navigation = {'next': 1, 'prev': -1, 'stop': 0}
+        validator = ValueInValidator(options=navigation.keys())
+
+        pages = paginate(positions, self.page_size)
+        number, count, page = next(pages)
+
+        while True:
+            self.pprint_many(self.store.take(page), fields=self.database_fields, language=self.language)
+            if count == 1:
+                return
+
+            step = navigation[self._get_command(
+                self.language.get('page_navigation').format(number=number + 1, count=count), validator
+            )]
+            if not step:
+                return
+
+            number, count, page = pages.send(step)
+
+
 class SetLanguageHandler(AbstractHandler):
-    def operate(self) -> dict[str, object]:
+    def operate(self) -> LanguagePack:
         """
         The function sets the interface language.
         The user is given a choice from all registered language packs.
@@ -102,12 +143,12 @@ class SetLanguageHandler(AbstractHandler):
         lang_codes = get_lang_codes()
 
         # Offers the user a choice of which interface language to use
-        message = self.language.get('select_language').format(options=', '.join(lang_codes))
+        message = self.language.render('select_language', options=', '.join(lang_codes))
         validator = ValueInValidator(options=lang_codes)
         chosen_code = self._get_command(message, validator)
 
         # Returns the language pack
-        return registered_languages.get(chosen_code)
+        return load_language(chosen_code)
 
 
 class WelcomeHandler(AbstractHandler):
@@ -117,7 +158,7 @@ class WelcomeHandler(AbstractHandler):
         options = self.language.get('agree_disagree')
 
         # Requests to the user about his desire to show tutorial
-        message = self.language.get('start').format(options='/'.join(options.keys()))
+        message = self.language.render('start', options=self.language.yes_no)
         validator = ValueInValidator(options=list(options.keys()))
         show_tutorial = self._get_command(message, validator)
 
@@ -126,7 +167,7 @@ class WelcomeHandler(AbstractHandler):
 
 
 class ShowTutorialHandler(AbstractHandler):
-    def __init__(self, language: dict[str, str | dict], tutorial_steps: tuple[str]):
+    def __init__(self, language: LanguagePack, tutorial_steps: tuple[str]):
         super().__init__(language)
         self.tutorial_steps = tutorial_steps
 
@@ -140,7 +181,7 @@ class ShowTutorialHandler(AbstractHandler):
             options = self.language.get('agree_disagree')
 
             # Requests to the user about his desire to continue training
-            message = self.language.get(step).format(options='/'.join(options.keys()))
+            message = self.language.render(step, options=self.language.yes_no)
             validator = ValueInValidator(options=list(options.keys()))
             further = self._get_command(message, validator)
 
@@ -152,15 +193,13 @@ Handler = TypeVar('Handler', bound=AbstractHandler)
 
 
 class ChooseCommandHandler(AbstractHandler):
-    def __init__(self, language: dict[str, str], commands_dict: dict[str, Handler]):
+    def __init__(self, language: LanguagePack, commands_dict: dict[str, Handler]):
         super().__init__(language)
         self.commands = commands_dict
 
     def operate(self) -> Type[Handler]:
         """Function offers the user a choice of handlers registered in the "commands" collection."""
-        message = self.language.get('require_input').format(
-            commands=', '.join(self.commands.keys())
-        )
+        message = self.language.render('require_input', commands=', '.join(self.commands.keys()))
         validator = ValueInValidator(options=self.commands.keys())
         command = self._get_command(message, validator)
 
@@ -168,35 +207,36 @@ class ChooseCommandHandler(AbstractHandler):
         return self.commands.get(command)
 
 
-class ShowStatisticHandler(AbstractHandler, PrettyPrintMixin):
-    def __init__(self, language: dict[str, str | dict], fields: dict[str, FieldAttrs]):
+class ShowStatisticHandler(AbstractHandler, PagerMixin):
+    def __init__(self, language: LanguagePack, fields: dict[str, FieldAttrs], store: LedgerStore):
         super().__init__(language)
         self.database_fields = fields
+        self.store = store
 
     def operate(self) -> None:
         """
         Function displays statistics to the user on his income/expenses.
-        The user can also get a list of database records filtered by category.
+        The user can also get a report of the balance by period and a list of database records filtered by category.
         """
         print(self.language.get('chosen_show_list'))
-        df = pd.read_csv('database.csv', index_col='pk')
+        statistic = self.store.statistic()
 
-        if len(df) == 0:
+        if not statistic.rows:
             print(self.language.get('empty_table'))
             raise ExitSignal
 
-        # Groups all records by income/expenses
-        expense, income = df.groupby('type').amount.sum()
+        # Totals are taken from the statistics cache, a category without records counts as zero
+        income, expense = statistic.get_total('income'), statistic.get_total('expense')
 
         print(self.language.get('statistic').format(
             summary=income - expense, income=income, expense=expense
         ))
+        self._show_period_report(statistic)
+        print(self.language.get('transactions_list'))
 
         # Prompts the user which transaction category to display
         validator = ValueInValidator(options=self.language.get('values_for_type'))
-        message = self.language.get('filter_by_type').format(
-            options=', '.join(self.language.get('values_for_type').values())
-        )
+        message = self.language.render('filter_by_type', options=self.language.type_options)
         display_by_type = self._get_command(message, validator)
 
         # The loop will run until the user enters "exit"
@@ -204,123 +244,165 @@ class ShowStatisticHandler(AbstractHandler, PrettyPrintMixin):
             message_keys = {'income': 'income_message', 'expense': 'expense_message'}
             print(self.language.get(message_keys[display_by_type]))
 
-            df.loc[df.type == display_by_type].apply(
-                self.pprint, fields=self.database_fields, language=self.language, axis=1
-            )
+            # Only the records of the chosen category are read from the table
+            self._show_pages(self.store.select(Condition('type', '==', display_by_type)))
 
             display_by_type = self._get_command(message, validator)
 
+    def _show_period_report(self, statistic: Aggregates) -> None:
+        """Shows income, expense and balance by week, month or year between the dates chosen by the user."""
+        message = self.language.render('choose_period', options=self.language.period_options)
+        period = self._get_command(message, ValueInValidator(options=self.language.get('values_for_period')))
+        if period == 'none':
+            return
+
+        # Either two dates in any form accepted for the date field, or "all"
+        date_regex = self.language.get('date_regex')
+        validator = RegExValidator(
+            rf'^\s*(?:all|(?P<first>{date_regex})\s+(?P<last>{date_regex}))\s*$', err_code='input_error'
+        )
+        dates = validator.pattern.search(self._get_command(self.language.get('report_range'), validator))
+
+        # The report is computed from the sums by day of the statistics cache, the records are not read
+        report = statistic.report(period, dates['first'], dates['last'])
+        if not len(report):
+            print(self.language.get('empty_report'))
+            return
+
+        columns = self.language.get('report_columns')
+        lines = [f'{columns[0]:<10}' + ''.join(f'{column:>18}' for column in columns[1:])]
+        for label, values in zip(report.index, report.to_numpy().tolist()):
+            lines.append(f'{label:<10}' + ''.join(f'{value:>18}' for value in values))
+        print('\n'.join(lines))
+
     @translate_dict
     def _get_command(self, message: str, validator: Optional[callable] = None) -> str:
         return super()._get_command(message, validator)
 
 
 class AddNoteHandler(AbstractHandler, PrettyPrintMixin):
-    def __init__(self, language: dict[str, str], fields: dict[str, FieldAttrs]):
+    def __init__(self, language: LanguagePack, fields: dict[str, FieldAttrs], store: LedgerStore):
         super().__init__(language)
         self.database_fields = fields
+        self.store = store
 
     def operate(self) -> None:
         """
         Prompts the user for the value of all fields contained in the database_field collection.
         Adds a new entry to the data file based on the received values.
-        For a new entry, the id is obtained by finding the number of entries in the file.
+        The id for a new entry is taken from the persistent key allocator of the store.
         """
         print(self.language.get('chosen_add_note'))
         entity = {}
 
         for field, field_attrs in self.database_fields.items():
             message = self.language.get(field_attrs.input_message)
-
-            # Since a field may not have a validator class, you must ensure that
-            # it exists before initializing a validator
-            validator = field_attrs.validator_class
-            validator = validator(
-                self.language.get(field_attrs.validator_arg_code),
-                err_code='input_error'
-            ) if validator else None
-
+            validator = field_attrs.get_validator(self.language)
             field_value = self._get_command(message, validator)
             entity[field] = field_value
 
-        df = pd.read_csv('database.csv', index_col='pk')
-        df.loc[len(df.index)] = entity.values()
+        # Only the new row is written to the end of the file
+        self.store.append(entity)
 
         # Displays the added entry
         print(self.language.get('note_add_success'))
-        df.tail(1).apply(
-            self.pprint, fields=self.database_fields, language=self.language, axis=1
-        )
+        self.pprint(entity, fields=self.database_fields, language=self.language)
 
-        df.to_csv('database.csv')
+    def check_fields(self, values: dict[str, str]) -> dict[str, str]:
+        """
+        Non-interactive core of the command: checks that the record has only the fields of the database.
+        Returns the record with the fields in the order of database_fields, missing fields are left empty.
+        The values themselves are checked by check_entities.
+        """
+        for field in values:
+            if field not in self.database_fields:
+                raise InvalidInputSignal('first_arg_err', field)
+
+        return {field: values.get(field, '') for field in self.database_fields}
+
+    def check_entities(self, frame: pd.DataFrame) -> np.ndarray:
+        """
+        Checks the values of many records with the same validators that are used when they are entered.
+        Every field is checked for the whole column at once.
+        Returns the first field with an invalid value for every row, or None for the valid rows.
+        """
+        import numpy as np
+
+        valid = np.ones(len(frame.index), dtype=bool)
+        failed_fields = np.full(len(frame.index), None, dtype=object)
+
+        for field, field_attrs in self.database_fields.items():
+            validator = field_attrs.get_validator(self.language)
+            if not validator:
+                continue
+
+            failed = valid & ~validator.validate_many(frame[field])
+            failed_fields[failed] = field
+            valid &= ~failed
+
+        return failed_fields
 
     @translate_dict
     def _get_command(self, message: str, validator: Optional[callable] = None) -> str:
         return super()._get_command(message, validator)
 
 
-class FindNotesHandler(AbstractHandler, PrettyPrintMixin):
-    def __init__(self, language: dict[str, str | dict], fields: dict[str, FieldAttrs]):
+class FindNotesHandler(AbstractHandler, PagerMixin):
+    def __init__(self, language: LanguagePack, fields: dict[str, FieldAttrs], store: LedgerStore):
         super().__init__(language)
         self.database_fields = fields
+        self.store = store
 
-    def operate(self) -> tuple[pd.DataFrame, str]:
+    def operate(self) -> pd.Index:
         """
         Creates a database query based on user selection.
         After generating each request, the user will be shown all the filtered records from the database.
         Next, the user is asked to create an additional query for the already filtered records.
 
-        The function returns a database object and a generated query, which is necessary for ChangeNotesHandler to work.
+        The function returns the keys of the filtered records, which are necessary for ChangeNotesHandler to work.
         """
         print(self.language.get('chosen_find_notes'))
 
-        queries = []
-        df = pd.read_csv('database.csv', index_col='pk')
+        query = Query(self.store)
 
         # Receives yes/no translation for selected language
         options = self.language.get('agree_disagree')
 
         further = True
         while further:
-            queries.append(self._get_query())
-            filtered_df = df.loc[df.query(f'({") & (".join(queries)})').index]
-            if not len(filtered_df):
+            positions = query.refine(self._get_query())
+            if not len(positions):
                 print(self.language.get('bad_query'))
                 raise ExitSignal
 
-            print(self.language.get('n_notes_found').format(number=len(filtered_df)))
-            filtered_df.apply(
-                self.pprint, fields=self.database_fields, language=self.language, axis=1
-            )
+            print(self.language.get('n_notes_found').format(number=len(positions)))
+            self._show_pages(positions)
 
             # Requests to the user about his desire to add more queries
-            message = self.language.get('add_query').format(options='/'.join(options.keys()))
+            message = self.language.render('add_query', options=self.language.yes_no)
             validator = ValueInValidator(options.keys())
             further = options[self._get_command(message, validator)]
 
-        return df, f'({") & (".join(queries)})'
+        return self.store.get_keys(positions)
 
     @translate_dict
     def _get_command(self, message: str, validator: Optional[callable] = None) -> str:
         return super()._get_command(message, validator)
 
-    def _get_query(self) -> str:
+    def _get_query(self) -> Condition:
         """
         Prompts the user for 3 parameters:
         1) Field by which filtering will occur
         2) A logical operation performed on the field values
         3) The value with which the field values will be compared
 
-        After this, the function returns the completed query string
+        After this, the function returns the condition built from them
         """
         # Gets a field to filter
-        main_validator = ValueInValidator(
-            options={k: self.language.get(k) for k in self.database_fields},
-            err_code='first_arg_err'
-        )
+        labels = self.language.get_labels(self.database_fields)
+        main_validator = ValueInValidator(options=labels, err_code='first_arg_err')
         main_arg = self._get_command(
-            message=self.language.get('chose_first_arg').format(
-                options=', '.join(self.language.get(k) for k in self.database_fields)),
+            message=self.language.render('chose_first_arg', options=', '.join(labels.values())),
             validator=main_validator
         )
 
@@ -333,44 +415,57 @@ class FindNotesHandler(AbstractHandler, PrettyPrintMixin):
             err_code='operator_err'
         )
         operation = self._get_command(
-            message=self.language.get('chose_operator').format(
-                options=', '.join(field_attrs.operations)),
+            message=self.language.render('chose_operator', options=', '.join(field_attrs.operations)),
             validator=oper_validator
         )
 
         # Gets a filter value
-        sub_validator = field_attrs.validator_class(
-            self.language.get(field_attrs.validator_arg_code),
-            err_code='input_error'
-        ) if field_attrs.validator_class else None
+        sub_validator = field_attrs.get_validator(self.language)
 
         sub_arg = self._get_command(
             message=self.language.get('chose_sub_arg'),
             validator=sub_validator
         )
 
-        return self.database_fields[main_arg].query_form.format(
-            main_arg=main_arg,
-            operation=operation,
-            sub_arg=sub_arg
-        )
+        return Condition(main_arg, operation, sub_arg)
+
+    def check_condition(self, condition: Condition) -> Condition:
+        """Non-interactive core of _get_query: checks the field, the operation and the value of the condition."""
+        field_attrs = self.database_fields.get(condition.field)
+        if not field_attrs:
+            raise InvalidInputSignal('first_arg_err', condition.field)
+        if condition.operation not in field_attrs.operations:
+            raise InvalidInputSignal('operator_err', condition.field)
+
+        validator = field_attrs.get_validator(self.language)
+        if validator and not validator.validate(condition.value) or condition.value == 'exit':
+            raise InvalidInputSignal('input_error', condition.field)
+
+        return condition
+
+    def find(self, conditions: list[Condition]) -> np.ndarray:
+        """Non-interactive core of the command: returns positions of the records satisfying all conditions."""
+        conditions = [self.check_condition(condition) for condition in conditions]
+
+        query = Query(self.store)
+        for condition in conditions:
+            positions = query.refine(condition)
+        return positions
 
 
 class ChangeNotesHandler(FindNotesHandler):
     def operate(self) -> None:
         """
         Gets the fields to change and then the new values for the selected fields.
-        After this it overwrites the database.
+        After this it writes only the changed records to the change log of the database.
         """
-        # Gets the results of FindNotesHandler.
-        df, query = super().operate()
+        # Gets the records matched by FindNotesHandler, so the query is not evaluated again
+        keys = super().operate()
 
         fields_to_change = self._get_fields_to_change()
         new_fields = self._get_new_field_values(fields_to_change)
 
-        df.loc[df.query(query).index, new_fields.keys()] = tuple(new_fields.values())
-
-        df.to_csv('database.csv')
+        self.store.update(keys, new_fields)
 
     def _get_fields_to_change(self) -> list[str]:
         """
@@ -384,18 +479,14 @@ class ChangeNotesHandler(FindNotesHandler):
         further = True
 
         while further:
-            validator = ValueInValidator(
-                options={k: self.language.get(k) for k in self.database_fields},
-                err_code='first_arg_err'
-            )
-            message = self.language.get('choose_field_to_change').format(
-                fields=', '.join([self.language.get(k) for k in self.database_fields])
-            )
+            labels = self.language.get_labels(self.database_fields)
+            validator = ValueInValidator(options=labels, err_code='first_arg_err')
+            message = self.language.render('choose_field_to_change', fields=', '.join(labels.values()))
             field = self._get_command(message, validator)
             fields_to_change.add(field)
 
             # Requests to the user about his desire to continue adding fields to change list
-            message = self.language.get('add_field').format(options='/'.join(options.keys()))
+            message = self.language.render('add_field', options=self.language.yes_no)
             validator = ValueInValidator(options.keys())
             further = options[self._get_command(message, validator)]
 
@@ -410,14 +501,7 @@ class ChangeNotesHandler(FindNotesHandler):
         result = {}
         for field in fields_to_change:
             field_attrs = self.database_fields.get(field)
-
-            # Since a field may not have a validator class, you must ensure that
-            # it exists before initializing a validator
-            validator = field_attrs.validator_class
-            validator = validator(
-                self.language.get(field_attrs.validator_arg_code),
-                err_code='input_error'
-            ) if validator else None
+            validator = field_attrs.get_validator(self.language)
 
             message = self.language.get(field_attrs.input_message)
             field_value = self._get_command(message, validator)
@@ -431,6 +515,92 @@ class ChangeNotesHandler(FindNotesHandler):
         return result
 
 
+class CompactNotesHandler(AbstractHandler):
+    def __init__(self, language: LanguagePack, fields: dict[str, FieldAttrs], store: LedgerStore):
+        super().__init__(language)
+        self.database_fields = fields
+        self.store = store
+
+    def operate(self) -> None:
+        """Rewrites the database file, folding the change log into it."""
+        print(self.language.get('chosen_compact'))
+        self.store.compact()
+        print(self.language.get('compact_success'))
+
+
+class ImportNotesHandler(AddNoteHandler):
+    # Number of rows of the imported file that are read and checked at once
+    chunk_size = 100_000
+
+    def __init__(self, language: LanguagePack, fields: dict[str, FieldAttrs], store: LedgerStore):
+        super().__init__(language, fields, store)
+        self.rejected = 0
+
+    def operate(self) -> None:
+        """
+        Imports records from an external CSV file whose header contains the fields of the database.
+        Valid rows are appended to the database, rejected rows are reported with their record numbers.
+        A file that cannot be read, e.g. one in another encoding, is reported and nothing is imported from it.
+        """
+        import pandas as pd
+
+        print(self.language.get('chosen_import'))
+        path = self._get_command(self.language.get('import_path'), FileValidator(err_code='file_not_found'))
+
+        try:
+            added, rejected = self.import_file(path)
+        except InvalidInputSignal as error:
+            print(self.language.get(error.err_code).format(fields=error.field))
+            raise ExitSignal
+        except (UnicodeDecodeError, pd.errors.ParserError, pd.errors.EmptyDataError, PermissionError) as error:
+            print(self.language.get('import_read_err').format(error=error))
+            raise ExitSignal
+
+        print(self.language.get('import_success').format(added=added, rejected=rejected))
+
+    def import_file(self, path: str) -> tuple[int, int]:
+        """
+        Non-interactive core of the command. The file is read in chunks, so memory does not grow with its size.
+        Returns the number of imported and rejected rows.
+        """
+        import pandas as pd
+
+        header = pd.read_csv(path, nrows=0).columns
+        missing = [field for field in self.database_fields if field not in header]
+        if missing:
+            raise InvalidInputSignal('import_columns_err', ', '.join(missing))
+
+        chunks = pd.read_csv(
+            path, usecols=list(self.database_fields), dtype=str, keep_default_na=False,
+            skip_blank_lines=False, chunksize=self.chunk_size
+        )
+        self.rejected = 0
+        added = self.store.append_frames(self._check_chunks(chunks))
+        return added, self.rejected
+
+    def _check_chunks(self, chunks: Iterator[pd.DataFrame]) -> Iterator[pd.DataFrame]:
+        """Yields the valid rows of every chunk. The rejected ones are reported and counted."""
+        import numpy as np
+
+        for chunk in chunks:
+            failed_fields = self.check_entities(chunk)
+            valid = np.equal(failed_fields, None)
+
+            # Records are numbered from 1 after the header. A quoted description may span several lines,
+            # so the number of a record is not the number of its line
+            records = chunk.index[~valid] + 1
+            if len(records):
+                self.rejected += len(records)
+                sys.stdout.write(''.join(
+                    self.language.get('record_rejected').format(
+                        record=record, err_code='input_error', field=field
+                    ) + '\n'
+                    for record, field in zip(records, failed_fields[~valid])
+                ))
+
+            yield chunk[valid][list(self.database_fields)]
+
+
 # All new commands are registered here.
 # The dictionary key is the command alias by which the value - handler can be called
 commands = {
@@ -438,4 +608,6 @@ commands = {
     'add': AddNoteHandler,
     'find': FindNotesHandler,
     'change': ChangeNotesHandler,
+    'compact': CompactNotesHandler,
+    'import': ImportNotesHandler,
 }
@@ -0,0 +1,547 @@
+import json
+import os
+import re
+import unicodedata
+from bisect import bisect_left
+from collections import defaultdict
+from typing import Iterable, Optional
+
+import numpy as np
+import pandas as pd
+
+
+def parse_dates(values) -> np.ndarray:
+    """
+    Converts date strings into a datetime64[D] array. Values that are not dates become NaT.
+    The fast ISO parser handles the regular "YYYY-MM-DD" form, other spellings accepted by the
+    date validator (e.g. "2024/1/5") are parsed separately.
+    """
+    values = pd.Series(values, dtype=object)
+    parsed = pd.to_datetime(values, format='ISO8601', errors='coerce')
+
+    retry = parsed.isna() & values.notna()
+    if retry.any():
+        parsed[retry] = pd.to_datetime(values[retry], format='mixed', errors='coerce')
+
+    return parsed.to_numpy(dtype='datetime64[D]')
+
+
+# Words of the descriptions: runs of letters and digits of any script
+word_pattern = re.compile(r'\w+')
+
+
+def tokenize(text) -> list[str]:
+    """
+    Splits a description into words. Case is ignored, and so are the different encodings of the same letter,
+    e.g. "é" written as one character or as "e" with a combining accent. Missing descriptions have no words.
+    """
+    if not isinstance(text, str):
+        return []
+    return word_pattern.findall(unicodedata.normalize('NFKC', text).casefold())
+
+
+class DayBuckets:
+    """
+    Sums of the amounts of every transaction type for each day from the earliest to the latest dated record.
+    Prefix sums over the days are kept next to the buckets, so the total of any range of days is
+    the difference of two of their values. Adding records only touches their buckets, the prefix sums are
+    recomputed on the next query, in one pass over the days rather than over the records.
+    """
+
+    def __init__(self, first: Optional[np.datetime64] = None, sums: Optional[dict[str, np.ndarray]] = None):
+        # {type: sums by day}. The day of the first bucket is None while no dated record was accounted
+        self.first = first
+        self.sums = sums or {}
+        self.size = len(next(iter(self.sums.values()))) if self.sums else 0
+        self._prefix = None
+
+    @property
+    def last(self) -> Optional[np.datetime64]:
+        return self.first + (self.size - 1) if self.size else None
+
+    def add(self, types, amounts: np.ndarray, days: np.ndarray) -> None:
+        """Adds the amounts to the buckets of their days and types. Records without a valid date are skipped."""
+        days = np.asarray(days, dtype='datetime64[D]')
+        valid = ~np.isnat(days)
+        if not valid.any():
+            return
+
+        days, amounts = days[valid], np.asarray(amounts, dtype=np.int64)[valid]
+        self._cover(days.min(), days.max())
+        offsets = (days - self.first).astype(np.int64)
+
+        codes, uniques = pd.factorize(np.asarray(types, dtype=object)[valid])
+        for code, type_ in enumerate(uniques):
+            if type_ not in self.sums:
+                self.sums[type_] = np.zeros(self.size, dtype=np.int64)
+            mask = codes == code
+            np.add.at(self.sums[type_], offsets[mask], amounts[mask])
+        self._prefix = None
+
+    def _cover(self, first: np.datetime64, last: np.datetime64) -> None:
+        """Extends the buckets with empty days, so they span the given days."""
+        if not self.size:
+            self.first, self.size = first, int((last - first).astype(np.int64)) + 1
+            self.sums = {type_: np.zeros(self.size, dtype=np.int64) for type_ in self.sums}
+            return
+
+        before = max(int((self.first - first).astype(np.int64)), 0)
+        after = max(int((last - self.last).astype(np.int64)), 0)
+        if before or after:
+            self.sums = {type_: np.pad(sums, (before, after)) for type_, sums in self.sums.items()}
+            self.first -= before
+            self.size += before + after
+
+    def get_totals(self, type_: str, starts: np.ndarray, stops: np.ndarray) -> np.ndarray:
+        """
+        Sums of the amounts of the type for the ranges of days from "starts" up to "stops", which are not included.
+        Every range costs O(1), whatever its length.
+        """
+        return self.get_totals_before(type_, stops) - self.get_totals_before(type_, starts)
+
+    def get_totals_before(self, type_: str, days: np.ndarray) -> np.ndarray:
+        """Sums of the amounts of the type over all days before each of the given days."""
+        if type_ not in self.sums:
+            return np.zeros(len(days), dtype=np.int64)
+
+        if self._prefix is None:
+            self._prefix = {type_: np.concatenate(([0], np.cumsum(sums))) for type_, sums in self.sums.items()}
+        return self._prefix[type_][np.clip((days - self.first).astype(np.int64), 0, self.size)]
+
+    def to_dict(self) -> dict:
+        if not self.size:
+            return {'first': None, 'sums': {}}
+        return {'first': str(self.first), 'sums': {type_: sums.tolist() for type_, sums in self.sums.items()}}
+
+    @classmethod
+    def from_dict(cls, data: dict) -> 'DayBuckets':
+        if not data['first']:
+            return cls()
+        return cls(np.datetime64(data['first'], 'D'),
+                   {type_: np.array(sums, dtype=np.int64) for type_, sums in data['sums'].items()})
+
+
+# Units of numpy dates of the months and years of the reports. Weeks are counted separately, from Monday
+period_units = {'month': 'datetime64[M]', 'year': 'datetime64[Y]'}
+
+
+def get_period_starts(period: str, first: np.datetime64, last: np.datetime64) -> np.ndarray:
+    """
+    First days of the weeks, months or years from the one containing the day "first" to the one containing
+    the day "last", followed by the first day of the next period. Weeks start on Monday.
+    """
+    if period == 'week':
+        # Day 0 of numpy, 1970-01-01, was a Thursday
+        monday = first - (first.astype(np.int64) + 3) % 7
+        return np.arange(monday, last + 8, 7)
+
+    unit = period_units[period]
+    return np.arange(first.astype(unit), last.astype(unit) + 2).astype('datetime64[D]')
+
+
+def get_period_label(period: str, start: np.datetime64) -> str:
+    if period == 'week':
+        year, week, _ = start.astype(object).isocalendar()
+        return f'{year}-W{week:02d}'
+    return str(start.astype(period_units[period]))
+
+
+class Aggregates:
+    """
+    Running income/expense statistics of the database, persisted in a sidecar file next to it.
+    Stores the sums and the number of records for each transaction type, overall and for each day.
+
+    The sidecar also keeps the signature of the database file it was computed for,
+    so a cache that has drifted from the file is detected and rebuilt.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.signature = None
+
+        # {type: sum}, {type: number of records}, sums of every type by day
+        self.total = defaultdict(int)
+        self.count = defaultdict(int)
+        self.by_day = DayBuckets()
+
+    @property
+    def rows(self) -> int:
+        return sum(self.count.values())
+
+    def get_total(self, type_: str) -> int:
+        return self.total.get(type_, 0)
+
+    def rebuild(self, table, signature: tuple[int, ...]) -> None:
+        """Computes the statistics from scratch. Only the date, type and amount columns of the table are read."""
+        self.total = defaultdict(int)
+        self.count = defaultdict(int)
+        self.by_day = DayBuckets()
+
+        self._account(table.column('type'), table.column('amount'), table.column('date'))
+        self.dump(signature)
+
+    def add(self, entity: dict[str, str | int], sign: int = 1) -> None:
+        """Accounts a single record. With sign=-1 removes a previously accounted record."""
+        type_, amount = entity['type'], int(entity['amount']) * sign
+        self.total[type_] += amount
+        self.count[type_] += sign
+        self.by_day.add([type_], np.array([amount]), parse_dates([entity['date']]))
+
+    def add_many(self, frame: pd.DataFrame, sign: int = 1) -> None:
+        """Accounts all records of the table at once. With sign=-1 removes previously accounted records."""
+        self._account(frame.type, frame.amount.to_numpy(dtype=np.int64), parse_dates(frame.date), sign)
+
+    def _account(self, types, amounts: np.ndarray, dates: np.ndarray, sign: int = 1) -> None:
+        amounts = np.asarray(amounts, dtype=np.int64) * sign
+        frame = pd.DataFrame({'type': types, 'amount': amounts})
+
+        by_type = frame.groupby('type', observed=True).amount
+        for type_, amount in by_type.sum().items():
+            self.total[type_] += int(amount)
+        for type_, count in by_type.size().items():
+            self.count[type_] += int(count) * sign
+
+        # Records without a valid date are not accounted by day
+        self.by_day.add(frame.type.to_numpy(dtype=object), amounts, dates)
+
+    def report(self, period: str, first: str = None, last: str = None) -> pd.DataFrame:
+        """
+        Income, expense and balance for every week, month or year from the day "first" to the day "last",
+        by default from the earliest to the latest dated record. The running balance is the balance of all records
+        up to the end of the period. Every value is taken from the prefix sums of the days,
+        so the report does not depend on the number of records.
+        """
+        columns = ['income', 'expense', 'balance', 'running_balance']
+        if not self.by_day.size:
+            return pd.DataFrame(columns=columns)
+
+        first = parse_dates([first])[0] if first else self.by_day.first
+        last = parse_dates([last])[0] if last else self.by_day.last
+        if np.isnat(first) or np.isnat(last) or first > last:
+            return pd.DataFrame(columns=columns)
+
+        # The first and the last period are cut to the requested days
+        starts = get_period_starts(period, first, last)
+        stops = np.minimum(starts[1:], last + 1)
+        starts = np.maximum(starts[:-1], first)
+
+        income = self.by_day.get_totals('income', starts, stops)
+        expense = self.by_day.get_totals('expense', starts, stops)
+        running = self.by_day.get_totals_before('income', stops) - self.by_day.get_totals_before('expense', stops)
+
+        return pd.DataFrame(
+            dict(zip(columns, (income, expense, income - expense, running))),
+            index=[get_period_label(period, start) for start in starts],
+        )
+
+    def load(self, signature: tuple[int, ...]) -> bool:
+        """Reads the sidecar file. Returns False if it is missing or was computed for another state of the database."""
+        try:
+            with open(self.path, encoding='utf-8') as file:
+                data = json.load(file)
+        except (OSError, ValueError):
+            return False
+
+        # Sidecars of the previous versions have no sums by day and are rebuilt
+        if tuple(data.get('signature', ())) != tuple(signature) or 'by_day' not in data:
+            return False
+
+        self.total = defaultdict(int, data['total'])
+        self.count = defaultdict(int, data['count'])
+        self.by_day = DayBuckets.from_dict(data['by_day'])
+
+        self.signature = signature
+        return True
+
+    def dump(self, signature: Optional[tuple[int, ...]]) -> None:
+        """Persists the statistics as computed for the given state of the database."""
+        self.signature = signature
+        data = {
+            'signature': signature,
+            'total': self.total,
+            'count': self.count,
+            'by_day': self.by_day.to_dict(),
+        }
+
+        # The sidecar is replaced atomically, so a reader never sees a half-written file.
+        # Readers of several processes may rebuild it at once, so each one writes its own temporary file
+        temp_path = f'{self.path}.{os.getpid()}.tmp'
+        with open(temp_path, 'w', encoding='utf-8') as file:
+            json.dump(data, file, ensure_ascii=False)
+        os.replace(temp_path, self.path)
+
+
+class DateIndex:
+    """
+    Row positions of the table ordered by date.
+    Conditions on the date are answered by binary search, the matching rows form a contiguous slice of the order.
+    """
+
+    def __init__(self, parsed: np.ndarray):
+        self.order = np.argsort(parsed, kind='stable')
+        self.dates = parsed[self.order]
+
+        # NaT values are sorted to the end and never match any condition
+        self.valid = len(self.dates) - int(np.count_nonzero(np.isnat(self.dates)))
+
+    def extend(self, parsed: np.ndarray, first_position: int) -> None:
+        """Adds rows appended to the end of the table without sorting the whole order again."""
+        positions = np.arange(first_position, first_position + len(parsed))
+
+        valid = ~np.isnat(parsed)
+        slots = np.searchsorted(self.dates[:self.valid], parsed[valid], side='right')
+        self.order = np.concatenate((
+            np.insert(self.order[:self.valid], slots, positions[valid]), self.order[self.valid:], positions[~valid]
+        ))
+        self.dates = np.concatenate((
+            np.insert(self.dates[:self.valid], slots, parsed[valid]), self.dates[self.valid:], parsed[~valid]
+        ))
+        self.valid += int(np.count_nonzero(valid))
+
+    def select(self, operation: str, value: str) -> np.ndarray:
+        """Returns positions of the rows whose date satisfies the condition, in date order."""
+        key = parse_dates([value])[0]
+        if np.isnat(key):
+            return self.order[:0]
+
+        dates = self.dates[:self.valid]
+        left = int(np.searchsorted(dates, key, side='left'))
+        right = int(np.searchsorted(dates, key, side='right'))
+
+        bounds = {
+            '==': (left, right),
+            '>': (right, self.valid),
+            '>=': (left, self.valid),
+            '<': (0, left),
+            '<=': (0, right),
+        }
+        start, stop = bounds[operation]
+        return self.order[start:stop]
+
+
+class TextIndex:
+    """
+    Inverted index of the words of the descriptions: for every word, the positions of the rows that contain it.
+    The words are sorted, so the words starting with a prefix form a contiguous range of them. The positions
+    of every word are sorted too, so a query for one word returns a slice of the postings as it is.
+
+    Rows added or changed after the postings were built are kept in a small delta, which is searched
+    along with them, while the outdated postings of the changed rows are masked. The delta is persisted
+    as a log next to the sidecar, one line per commit, and merged into the postings when it grows.
+    Like the statistics, the sidecar is valid only for the state of the database it was computed for.
+    """
+
+    # The delta is merged when it covers more than 1/merge_ratio of the rows and at least merge_min_rows rows
+    merge_ratio = 64
+    merge_min_rows = 1024
+
+    def __init__(self, path: str):
+        self.path = path
+        self.log_path = f'{path}.log'
+        self.signature = None
+        self.rows = 0
+        self._set_postings([], np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64))
+
+    def _set_postings(self, words: list[str], word_ids: np.ndarray, positions: np.ndarray) -> None:
+        """Replaces the postings with the (word, position) pairs, the words being indexes of the sorted words."""
+        order = np.lexsort((positions, word_ids))
+        self.words = words
+        self.postings = positions[order].astype(np.int32)
+        self.offsets = np.concatenate(([0], np.cumsum(np.bincount(word_ids, minlength=len(words)))))
+
+        # {position: words} of the rows added or changed since the postings were built, {word: positions} of them
+        self.delta = {}
+        self.delta_words = defaultdict(set)
+        self._stale = np.empty(0, dtype=np.int64)
+        # Rows of the delta not written to the log yet
+        self._unlogged = {}
+
+    def rebuild(self, column: np.ndarray, signature: tuple[int, ...]) -> None:
+        """
+        Builds the index from the whole column of descriptions. Every distinct description is split into words
+        only once, which matters for ledgers where the same payees repeat over and over.
+        """
+        codes, descriptions = pd.factorize(pd.Series(column, dtype=object))
+        words_by_description = [set(tokenize(text)) for text in descriptions]
+        words = sorted(set().union(*words_by_description))
+        word_ids = {word: word_id for word_id, word in enumerate(words)}
+
+        # Rows of every distinct description, in table order. Rows without a description come first and are skipped
+        rows = np.argsort(codes, kind='stable')
+        counts = np.bincount(codes[codes >= 0], minlength=len(descriptions))
+        starts = len(codes) - int(counts.sum()) + np.concatenate(([0], np.cumsum(counts)[:-1]))
+
+        # Every (word, description) pair is expanded into the rows of the description
+        pair_descriptions = np.repeat(np.arange(len(descriptions)), [len(words) for words in words_by_description])
+        pair_words = np.fromiter(
+            (word_ids[word] for words in words_by_description for word in words), dtype=np.int64,
+            count=len(pair_descriptions),
+        )
+        lengths = counts[pair_descriptions]
+        pair_starts = np.concatenate(([0], np.cumsum(lengths)[:-1]))
+        slots = np.repeat(starts[pair_descriptions] - pair_starts, lengths) + np.arange(int(lengths.sum()))
+
+        self.rows = len(codes)
+        self._set_postings(words, np.repeat(pair_words, lengths), rows[slots])
+        self.dump(signature, full=True)
+
+    def add(self, first_position: int, descriptions: Iterable) -> None:
+        """Indexes the rows appended to the table, starting from the given position."""
+        for position, text in enumerate(descriptions, start=first_position):
+            self._index_row(position, tokenize(text))
+            self.rows = max(self.rows, position + 1)
+
+    def change(self, positions: np.ndarray, descriptions: Iterable) -> None:
+        """Indexes the new descriptions of the changed rows."""
+        for position, text in zip(positions.tolist(), descriptions):
+            self._index_row(position, tokenize(text))
+
+    def _index_row(self, position: int, words: list[str]) -> None:
+        # A word repeated in a description is indexed once
+        words = list(dict.fromkeys(words))
+        for word in self.delta.get(position, ()):
+            self.delta_words[word].discard(position)
+
+        if position < self.rows and position not in self.delta:
+            self._stale = np.append(self._stale, position)
+        self.delta[position] = words
+        self._unlogged[position] = words
+        for word in words:
+            self.delta_words[word].add(position)
+
+    def select(self, operation: str, value: str) -> np.ndarray:
+        """
+        Returns positions of the rows, in table order, that contain every word of the value ("~="),
+        or a word starting with every word of the value ("^="). A value without words matches nothing.
+        """
+        found = sorted((self._find(word, prefix=operation == '^=') for word in set(tokenize(value))), key=len)
+        if not found:
+            return np.empty(0, dtype=np.int64)
+
+        # The positions of the rarest word are kept if the other words are found at them too
+        result = found[0]
+        for positions in found[1:]:
+            mask = np.zeros(self.rows, dtype=bool)
+            mask[positions] = True
+            result = result[mask[result]]
+        return result
+
+    def _find(self, word: str, prefix: bool) -> np.ndarray:
+        first = bisect_left(self.words, word)
+        if prefix:
+            # The first string after all the strings starting with the word
+            last = bisect_left(self.words, word[:-1] + chr(ord(word[-1]) + 1))
+        else:
+            last = first + 1 if first < len(self.words) and self.words[first] == word else first
+
+        positions = self.postings[self.offsets[first]:self.offsets[last]].astype(np.int64)
+        if last - first > 1:
+            positions = np.unique(positions)
+        if len(self._stale):
+            positions = positions[~np.isin(positions, self._stale)]
+
+        if prefix:
+            added = [rows for delta_word, rows in self.delta_words.items() if delta_word.startswith(word) and rows]
+        else:
+            added = [self.delta_words[word]] if self.delta_words.get(word) else []
+        if added:
+            positions = np.union1d(positions, np.fromiter(set().union(*added), dtype=np.int64))
+        return positions
+
+    def merge(self) -> None:
+        """Folds the delta into the postings."""
+        word_ids = np.repeat(np.arange(len(self.words)), np.diff(self.offsets))
+        positions = self.postings.astype(np.int64)
+        kept = ~np.isin(positions, self._stale)
+
+        words = sorted(set(self.words).union(*self.delta.values()))
+        new_ids = {word: word_id for word_id, word in enumerate(words)}
+        renumbered = np.fromiter((new_ids[word] for word in self.words), dtype=np.int64, count=len(self.words))
+
+        delta_pairs = [(new_ids[word], position) for position, row_words in self.delta.items() for word in row_words]
+        delta_ids, delta_positions = np.array(delta_pairs, dtype=np.int64).reshape(-1, 2).T
+
+        self._set_postings(
+            words,
+            np.concatenate((renumbered[word_ids[kept]], delta_ids)),
+            np.concatenate((positions[kept], delta_positions)),
+        )
+
+    def load(self, signature: tuple[int, ...]) -> bool:
+        """
+        Reads the sidecar and replays its log. Returns False if they are missing
+        or were computed for another state of the database. The signatures are checked first,
+        so a sidecar that does not match costs only reading its log.
+        """
+        try:
+            with open(self.log_path, encoding='utf-8') as file:
+                lines = file.read().splitlines()
+            # Lines are only appended, so a crash may cut off only the last one
+            if len(lines) > 1:
+                try:
+                    json.loads(lines[-1])
+                except ValueError:
+                    lines.pop()
+
+            with np.load(self.path) as data:
+                # The log continues the sidecar only if it was started for the same state,
+                # and the signature of its last line is the state the index is valid for
+                base = tuple(data['signature'].tolist())
+                if not lines or tuple(json.loads(lines[0]).get('base') or ()) != base:
+                    return False
+                current = tuple(json.loads(lines[-1])['signature'] or ()) if len(lines) > 1 else base
+                if current != tuple(signature or ()):
+                    return False
+
+                # Members of the archive are read only on access
+                words = data['words'].tobytes().decode('utf-8').split('\n') if len(data['words']) else []
+                offsets, postings, rows = data['offsets'], data['postings'], int(data['rows'])
+        except (OSError, ValueError, KeyError):
+            return False
+
+        self.rows = rows
+        self._set_postings([], np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64))
+        self.words, self.offsets, self.postings = words, offsets, postings
+
+        for line in lines[1:]:
+            for position, row_words in json.loads(line)['rows']:
+                self._index_row(position, row_words)
+                self.rows = max(self.rows, position + 1)
+
+        self._unlogged = {}
+        self.signature = signature
+        return True
+
+    def dump(self, signature: Optional[tuple[int, ...]], full: bool = False) -> None:
+        """
+        Persists the index as computed for the given state of the database. Usually only the rows indexed
+        since the previous dump are appended to the log. The delta is merged and the whole sidecar is written
+        when the delta has grown or when "full" is set.
+        """
+        self.signature = signature
+        full = full or len(self.delta) > max(self.merge_min_rows, self.rows // self.merge_ratio)
+
+        if not full and os.path.exists(self.log_path):
+            entry = {'rows': list(self._unlogged.items()), 'signature': signature}
+            with open(self.log_path, 'a', encoding='utf-8') as file:
+                file.write(json.dumps(entry, ensure_ascii=False) + '\n')
+            self._unlogged = {}
+            return
+
+        if self.delta:
+            self.merge()
+
+        # Both files are replaced atomically, the log first: a log started for another state is ignored
+        temp_path = f'{self.log_path}.{os.getpid()}.tmp'
+        with open(temp_path, 'w', encoding='utf-8') as file:
+            file.write(json.dumps({'base': signature}) + '\n')
+        os.replace(temp_path, self.log_path)
+
+        temp_path = f'{self.path}.{os.getpid()}.tmp'
+        with open(temp_path, 'wb') as file:
+            np.savez(
+                file, signature=np.array(signature or (), dtype=np.int64), rows=self.rows,
+                words=np.frombuffer('\n'.join(self.words).encode('utf-8'), dtype=np.uint8),
+                offsets=self.offsets, postings=self.postings,
+            )
+        os.replace(temp_path, self.path)
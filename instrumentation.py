@@ -0,0 +1,146 @@
+import atexit
+import io
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from functools import wraps
+
+# Categories of the measured time. The time spent waiting for the user is kept apart,
+# so the latency of a command does not include the time the user thinks
+categories = ('io', 'query', 'render', 'input')
+
+# Time spent outside the commands, e.g. while the user chooses the next one
+session_name = '(session)'
+
+
+class Instrumentation:
+    """
+    Collects the wall time of the commands and of their parts: reading and writing the database (io),
+    evaluating conditions and statistics (query), formatting records (render) and waiting for input (input).
+    Parts may be nested, e.g. a query that opens the table: every part is counted only once, in the innermost one.
+    The time of a command not covered by any part is reported as "other".
+
+    Disabled by default, so the measured functions cost only one attribute check.
+    """
+
+    def __init__(self):
+        self.enabled = False
+        # The first run of this command is captured by cProfile
+        self.profiled_command = None
+        self.profile = None
+        self.timings = {}
+
+        self._command = session_name
+        # Open parts: [category, start time, time of the nested parts]
+        self._spans = []
+
+    def enable(self, profiled_command: str = None) -> None:
+        """Starts collecting the timings. The summary is printed to stderr when the program exits."""
+        if not self.enabled:
+            atexit.register(self.print_summary)
+        self.enabled = True
+        self.profiled_command = profiled_command
+
+    def _get_timings(self, name: str) -> dict[str, float]:
+        if name not in self.timings:
+            self.timings[name] = {'calls': 0, 'wall': 0.0, **dict.fromkeys(categories, 0.0)}
+        return self.timings[name]
+
+    @contextmanager
+    def command(self, name: str):
+        """Measures one run of the command with the given name."""
+        if not self.enabled:
+            yield
+            return
+
+        profiler = None
+        if name == self.profiled_command and self.profile is None:
+            import cProfile
+            profiler = cProfile.Profile()
+
+        outer_command, self._command = self._command, name
+        timings = self._get_timings(name)
+        started = time.perf_counter()
+        if profiler:
+            profiler.enable()
+        try:
+            yield
+        finally:
+            if profiler:
+                profiler.disable()
+                self.profile = format_profile(profiler)
+
+            timings['calls'] += 1
+            timings['wall'] += time.perf_counter() - started
+            self._command = outer_command
+
+    @contextmanager
+    def span(self, category: str):
+        """
+        Measures a part of the running command. Work done by other threads, such as the background writes
+        of the database, does not delay the command and is not measured.
+        """
+        if not self.enabled or threading.current_thread() is not threading.main_thread():
+            yield
+            return
+
+        span = [category, time.perf_counter(), 0.0]
+        self._spans.append(span)
+        try:
+            yield
+        finally:
+            self._spans.pop()
+            elapsed = time.perf_counter() - span[1]
+
+            # The nested parts are already counted in their own categories
+            self._get_timings(self._command)[category] += elapsed - span[2]
+            if self._spans:
+                self._spans[-1][2] += elapsed
+
+    def print_summary(self, file=None) -> None:
+        """Prints the timings of every command in seconds, and the profile of the captured command."""
+        file = file or sys.stderr
+        if not self.timings:
+            return
+
+        columns = ('calls', 'latency', 'io', 'query', 'render', 'other', 'input')
+        print('\n' + f'{"command":<12}' + ''.join(f'{column:>10}' for column in columns), file=file)
+
+        for name, timings in sorted(self.timings.items(), key=lambda item: item[0] == session_name):
+            # Outside the commands only the parts themselves are measured
+            wall = timings['wall'] if name != session_name else sum(timings[category] for category in categories)
+            latency = wall - timings['input']
+            other = latency - timings['io'] - timings['query'] - timings['render']
+
+            values = (latency, timings['io'], timings['query'], timings['render'], other, timings['input'])
+            print(f'{name:<12}{timings["calls"]:>10}' + ''.join(f'{value:>10.3f}' for value in values), file=file)
+
+        if self.profile:
+            print(f'\nProfile of the first run of "{self.profiled_command}":\n{self.profile}', file=file)
+
+
+def format_profile(profiler) -> str:
+    """The 25 functions with the largest cumulative time."""
+    import pstats
+
+    stream = io.StringIO()
+    pstats.Stats(profiler, stream=stream).sort_stats('cumulative').print_stats(25)
+    return stream.getvalue()
+
+
+# Timings of the whole program
+instrumentation = Instrumentation()
+
+
+def timed(category: str):
+    """Decorator: the time of every call of the function is counted in the category."""
+    def decorator(func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            if not instrumentation.enabled:
+                return func(*args, **kwargs)
+            with instrumentation.span(category):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
@@ -0,0 +1,149 @@
+# English language pack
+messages = {
+    'select_language': 'Before you start, select the interface language: {options}:\n ... ',
+    'notfound_command': 'The command is not recognized! Check your input and try again.\n ... ',
+
+    # ---------------------------------------- Initial message -------------------------------------------------
+    'start': '\nWelcome to the Personal Financial Wallet application!\n\n'
+             'Before you start, we suggest you complete a short training session that will show you how to use '
+             'a program.\n\nDo you want to get trained? "{options}" ... ',
+
+    # ---------------------------------------- Tutorial section ------------------------------------------------
+    'short_description': '\nShort description:\n\n'
+
+                         'The application is a database that contains information about your income and expenses.\n'
+                         'You have 4 main actions available to you: display income/expense statistics, add \n'
+                         'a new record in the database, as well as display or change records according to the\n'
+                         'specified condition.\n\n'
+
+                         'Every time the program needs values to work, you will be shown all available commands.\n'
+                         'All commands must be typed exactly as in the example.\n\n'
+
+                         'At any time you have access to the "exit" command, which will return you to the main menu.\n'
+
+                         'Detailed instructions for using each function follow.\n\n'
+
+                         'Do you want to continue? "{options}"\n ... ',
+
+    'show': '\nShow statistics:\n\n'
+
+            'To display statistics, you should select the "show" option from the main menu.\n'
+            'Next, you will be shown a brief summary of your balance, income and expenses.\n'
+            'You may then view your income, expense and balance by week, month or year, for the whole history\n'
+            'or between two dates, with the running balance at the end of every period.\n'
+            'You will then be asked to select which category of transactions to display in detail.\n'
+            'Depending on your selection, all entries from the "Income" or "Expense" categories will be displayed.\n\n'
+
+            'Do you want to continue? "{options}"\n ... ',
+
+    'add': '\nAdd a note:\n\n'
+
+           'To add a new entry to the database, you should select the "add" option in the main menu.\n'
+           'Next you will need to enter a value for each transaction field in turn.\n'
+           'For each field you will be told in what format the program expects the data from you.\n'
+           'Once you have entered all the required values, you will be shown the newly created entry.\n\n'
+
+           'Do you want to continue? "{options}"\n ... ',
+
+    'find': '\nFind transactions:\n\n'
+
+            'To find records by condition, you should select the "find" option in the main menu. \n'
+            'Next you will be given three main request arguments:\n'
+            '1. Specify the field by which filtering will be performed\n'
+            '2. Specify the operator that will be used to compare the values of the selected field\n'
+            '3. Specify the value that the operator will compare with the value of the record fields\n'
+            'Descriptions can also be searched by words, regardless of case: "~=" finds the records containing\n'
+            'all the entered words, "^=" the records with words starting with them (e.g. "caf" for "Café").\n\n'
+
+            'When all data is entered correctly, all records received will be displayed to you\n'
+            'at your request. You will then be prompted to add another condition to the request.\n'
+            'This way you can create complex queries with multiple conditions.\n\n'
+
+            'Do you want to continue? "{options}"\n ... ',
+    'change': '\nEdit transactions:\n\n'
+
+              'To change existing records in the database, you should select the "change" option in the main menu.\n'
+              'To begin with, the process is similar to the "find" command, but after composing the request you also\n'
+              'it will be necessary to specify the fields to change. Next you will be asked to specify a new value\n'
+              'for all selected fields.\n\n'
+
+              'Enter "y" to go to main menu \n ... ',
+
+    'require_input': '\nChoose an action: "{commands}"\n ... ',
+
+    # ---------------------------------------- Handler messages ------------------------------------------------
+    'chosen_show_list': '\n---------- DISPLAYING INCOME/EXPENSES STATISTICS ----------\n',
+    'empty_table': 'There are currently no entries in the database\n',
+    'bad_command': 'The command is not recognized, check the entered value! \n ... ',
+
+    'statistic': 'Current balance: {summary}\n'
+                 'Income: {income}\n'
+                 'Expense: {expense}\n',
+    'choose_period': 'Show the balance by period? Choose {options}\n ... ',
+    'values_for_period': {'week': 'Week', 'month': 'Month', 'year': 'Year', 'none': 'No'},
+    'report_range': 'Enter the first and the last date of the report (YYYY-MM-DD YYYY-MM-DD) '
+                    'or "all" for the whole history\n ... ',
+    'report_columns': ('Period', 'Income', 'Expense', 'Balance', 'Running balance'),
+    'empty_report': 'There are no records in this period\n',
+    'transactions_list': '\n---------- LIST OF ALL TRANSACTIONS BY CATEGORIES ------------\n',
+    'filter_by_type': 'Select the transaction category to display: {options} or "exit" to exit\n ... ',
+
+    'income_message': '---------- INCOMES ------------\n',
+    'expense_message': '---------- EXPENSES ------------\n',
+
+    'chosen_add_note': '\n---------- ADDING A NEW TRANSACTION ----------',
+    'input_error': 'Incorrect value! Check the information you entered and try again:\n ... ',
+    'note_add_success': '\nYou have successfully added a new transaction to the database: \n',
+
+    'chosen_find_notes': '\n---------- FINDING TRANSACTIONS ----------:',
+    'chose_first_arg': 'Select an option to filter: "{options}"\n ... ',
+    'first_arg_err': 'You have selected a non-existent field, check the entered value!\n ... ',
+    'chose_operator': 'Select action on field value: "{options}"\n ... ',
+    'operator_err': 'You selected an invalid operator, check the entered value!\n ... ',
+    'chose_sub_arg': 'Select the value by which the selected field will be filtered:\n ... ',
+    'add_query': 'Do you want to add another filter condition?? "{options}"\n ... ',
+    'page_navigation': 'Page {number} of {count}. Enter "next" for the next page, "prev" for the previous one '
+                       'or "stop" to finish viewing\n ... ',
+    'bad_query': 'No records were found for your request!',
+    'n_notes_found': '{number} records found for your request:\n',
+
+    'chosen_change_notes': '\n---------- CHANGING ENTRIES -----------',
+    'choose_field_to_change': 'Select the field you want to change: {fields}\n ... ',
+    'add_field': 'Do you want to add more fields to the list to change?: "{options}"\n ... ',
+    'unexpected_field': 'One or more of the specified fields does not exist. Check the entered values! \n ... ',
+    'change_field': 'Enter a new value for the field "{field_name}"\n ... ',
+
+    'chosen_compact': '\n---------- COMPACTING THE DATABASE -----------',
+    'compact_success': 'The database file has been rewritten, all changes are folded into it.\n',
+    'write_failed': '\nSome of the latest changes could not be saved: {error}\n',
+
+    'chosen_import': '\n---------- IMPORTING RECORDS -----------',
+    'import_path': 'Enter the path to the CSV file with the records to import:\n ... ',
+    'file_not_found': 'File not found! Check the path and try again:\n ... ',
+    'import_columns_err': 'The file lacks the required columns: {fields}\n',
+    'import_read_err': 'The file could not be read, nothing was imported: {error}\n',
+    'import_success': 'Records imported: {added}, rejected: {rejected}\n',
+    'record_rejected': 'Record {record} rejected: {err_code} ({field})',
+
+    # ---------------------------------------- Batch mode ------------------------------------------------------
+    'line_rejected': 'Line {line} rejected: {err_code} ({field})',
+    'batch_done': 'Records added: {added}, lines rejected: {rejected}',
+
+    # -------------------------------------- Database Fields info ----------------------------------------------
+    'date': 'Date',
+    'date_regex': '(?:19|20)[0-9]{2}[-\\/ ]?(0?[1-9]|1[0-2])[-/ ]?(0?[1-9]|[12][0-9]|3[01])',
+    'date_input': 'Enter the transaction date (format YYYY-MM-DD):\n ... ',
+
+    'type': 'Type',
+    'values_for_type': {'income': 'Income', 'expense': 'Expense'},
+    'type_input': 'Enter the transaction category (Income or Expense):\n ... ',
+
+    'amount': 'Amount',
+    'amount_type': int,
+    'amount_input': 'Enter the transaction amount (numeric value):\n ... ',
+
+    'descr': 'Description',
+    'descr_input': 'Enter a description for the transaction:\n ... ',
+
+    'agree_disagree': {'yes': True, 'no': False},
+}
@@ -0,0 +1,150 @@
+# Russian language pack
+messages = {
+    'select_language': 'Перед началом работы, выберите язык интерфейса: {options}:\n ... ',
+    'notfound_command': 'Команда не распознана! Проверьте ввод и попробуйте еще раз.\n ... ',
+
+    # ---------------------------------------- Initial message -------------------------------------------------
+    'start': '\nДобро пожаловать в приложение "Личный финансовый кошелёк"!\n\n'
+             'Перед тем, как начать, предлагаем пройти короткое обучение, в котором будет показано, как пользоваться '
+             'программой.\n'
+             'Хотите пройти обучение? "{options}"\n ... ',
+
+    # ---------------------------------------- Tutorial section ------------------------------------------------
+    'short_description': '\nКраткое описание:\n\n'
+
+                         'Приложение представляет собой базу данных, в которой содержится информация о ваших \n'
+                         'доходах и расходах.\n'
+                         'Вам доступно 4 основных действия: отобразить статистику доходов/расходов, добавить \n'
+                         'новую запись в базу, а также отобразить или изменить записи по указанному условию.\n\n'
+
+                         'Каждый раз, когда программе будут необходимы значения для работы, вам будут выведены\n'
+                         'все доступные команды. Все команды необходимо набирать ровно также, как и в примере.\n\n'
+
+                         'В любой момент вам доступна команда "exit", которая вернет вас в главное меню.\n\n'
+
+                         'Далее следуют подробные инструкции по использованию каждой функции.\n\n'
+
+                         'Хотите продолжить? "{options}"\n ... ',
+
+    'show': '\nПоказать статистику:\n\n'
+
+            'Чтобы отобразить статистику, вам следует выбрать опцию "show" в главном меню.\n'
+            'Далее вам будет отображена краткая сводка о вашем балансе, доходах и расходах.\n'
+            'Затем можно посмотреть доходы, расходы и баланс по неделям, месяцам или годам - за всю историю\n'
+            'или между двумя датами, вместе с нарастающим итогом на конец каждого периода.\n'
+            'После этого вам будет предложено выбрать, какую категорию транзакций отобразить подробно.\n'
+            'В зависимости от выбора, будут отображены все записи из категории "Доход" или "Расход".\n\n'
+
+            'Хотите продолжить? "{options}"\n ... ',
+
+    'add': '\nДобавить запись:\n\n'
+
+           'Чтобы добавить новую запись в базу, вам следует выбрать опцию "add" в главном меню.\n'
+           'Далее вам потребуется ввести значение для каждого поля транзакции по очереди.\n'
+           'Для каждого поля вам будет указано, данные в каком формате от вас ожидает программа.\n'
+           'После ввода всех требуемых значений, вам будет показана только что созданная запись.\n\n'
+
+           'Хотите продолжить? "{options}"\n ... ',
+
+    'find': '\nНайти записи:\n\n'
+
+            'Чтобы найти записи по условию, вам следует выбрать опцию "find" в главном меню. \n'
+            'Далее вам  нужно будет указать три основных аргумента запроса:\n'
+            '1.  Указать поле, по которому будет совершена фильтрация\n'
+            '2.  Указать оператор, который будет использован в сравнении значений выбранного поля\n'
+            '3.  Указать значение, которое оператор будет сравнивать со значением полей записей\n'
+            'Описание можно искать и по словам, без учета регистра: "~=" находит записи, содержащие все\n'
+            'введенные слова, "^=" - записи со словами, начинающимися с них (например, "обе" для "На обед").\n\n'
+
+            'Когда все данные будут корректно указаны, вам будут отображены все записи, полученные\n'
+            'по вашему запросу. После этого вам будет предложено добавить еще одно условие к запросу.\n'
+            'Так вы cможете создавать сложные запросы с несколькими условиями.\n\n'
+
+            'Хотите продолжить? "{options}"\n ... ',
+    'change': '\nИзменить записи:\n\n'
+
+              'Чтобы изменить существующие записи в базе, вам следует выбрать опцию "change" в главном меню.\n'
+              'Для начала, процесс аналогичен команде "find", однако после составления запроса вам также\n'
+              'будет необходимо указать поля для изменения. Далее вам будет предложено указать новое значение\n'
+              'для всех выбранных полей.\n\n'
+
+              'Введите "y", чтобы перейти в главное меню \n ... ',
+
+    'require_input': '\nВыберите действие: "{commands}"\n ... ',
+
+    # ---------------------------------------- Handler messages ------------------------------------------------
+    'chosen_show_list': '\n---------- ОТОБРАЖЕНИЕ СТАТИСТИКИ ДОХОДОВ/РАСХОДОВ ----------\n',
+    'empty_table': 'На данный момент, в базе данных нет записей\n',
+    'bad_command': 'Команда не распознана, проверьте введенное значение! \n ... ',
+
+    'statistic': 'Текущий баланс: {summary}\n'
+                 'Доход: {income}\n'
+                 'Расход: {expense}\n',
+    'choose_period': 'Показать баланс по периодам? Выберите {options}\n ... ',
+    'values_for_period': {'week': 'Неделя', 'month': 'Месяц', 'year': 'Год', 'none': 'Нет'},
+    'report_range': 'Введите первую и последнюю дату отчета (ГГГГ-ММ-ДД ГГГГ-ММ-ДД) '
+                    'либо "all" для всей истории\n ... ',
+    'report_columns': ('Период', 'Доход', 'Расход', 'Баланс', 'Нарастающий итог'),
+    'empty_report': 'За этот период нет записей\n',
+    'transactions_list': '\n---------- СПИСОК ВСЕХ ТРАНЗАКЦИЙ ПО КАТЕГОРИЯМ ------------\n',
+    'filter_by_type': 'Выберите категорию транзакций для отображения: {options} либо "exit" для выхода\n ... ',
+
+    'income_message': '---------- ДОХОДЫ ------------\n',
+    'expense_message': '---------- РАСХОДЫ ------------\n',
+
+    'chosen_add_note': '\n---------- ДОБАВЛЕНИЕ НОВОЙ ТРАНЗАКЦИИ ----------',
+    'input_error': 'Некорректное значение! Проверьте введенную информацию и попробуйте снова:\n ... ',
+    'note_add_success': '\nВы успешно добавили новую транзакцию в базу: \n',
+
+    'chosen_find_notes': '\n---------- НАХОЖДЕНИЕ ТРАНЗАКЦИЙ ----------:',
+    'chose_first_arg': 'Выберите параметр для фильтрации: "{options}"\n ... ',
+    'first_arg_err': 'Вы выбрали несуществующее поле, проверьте введенное значение!\n ... ',
+    'chose_operator': 'Выберите действие над значением поля: "{options}"\n ... ',
+    'operator_err': 'Вы выбрали недопустимый оператор, проверьте введенное значение!\n ... ',
+    'chose_sub_arg': 'Выберите значение, по которому выбранное поле будет отфильтровано:\n ... ',
+    'add_query': 'Хотите добавить еще одно условие фильтрации? "{options}"\n ... ',
+    'page_navigation': 'Страница {number} из {count}. Введите "next" для следующей страницы, "prev" для предыдущей '
+                       'или "stop", чтобы закончить просмотр\n ... ',
+    'bad_query': 'По вашему запросу не найдено ни одной записи!',
+    'n_notes_found': 'По вашему запросу найдено {number} записей:\n',
+
+    'chosen_change_notes': '\n---------- ИЗМЕНЕНИЕ ЗАПИСЕЙ -----------',
+    'choose_field_to_change': 'Выберите поле, которое хотите изменить: {fields}\n ... ',
+    'add_field': 'Хотите добавить в список для изменения еще поля?: "{options}"\n ... ',
+    'unexpected_field': 'Одно или несколько из указанных полей не существует. Проверьте введенные значения! \n ... ',
+    'change_field': 'Введите новое значение для поля "{field_name}"\n ... ',
+
+    'chosen_compact': '\n---------- СЖАТИЕ БАЗЫ ДАННЫХ -----------',
+    'compact_success': 'Файл базы данных перезаписан, все изменения перенесены в него.\n',
+    'write_failed': '\nНе удалось сохранить некоторые из последних изменений: {error}\n',
+
+    'chosen_import': '\n---------- ИМПОРТ ЗАПИСЕЙ -----------',
+    'import_path': 'Введите путь к CSV-файлу с записями для импорта:\n ... ',
+    'file_not_found': 'Файл не найден! Проверьте путь и попробуйте снова:\n ... ',
+    'import_columns_err': 'В файле отсутствуют обязательные столбцы: {fields}\n',
+    'import_read_err': 'Не удалось прочитать файл, ничего не импортировано: {error}\n',
+    'import_success': 'Импортировано записей: {added}, отклонено: {rejected}\n',
+    'record_rejected': 'Запись {record} отклонена: {err_code} ({field})',
+
+    # ---------------------------------------- Batch mode ------------------------------------------------------
+    'line_rejected': 'Строка {line} отклонена: {err_code} ({field})',
+    'batch_done': 'Добавлено записей: {added}, отклонено строк: {rejected}',
+
+    # -------------------------------------- Database Fields info ----------------------------------------------
+    'date': 'Дата',
+    'date_regex': '(?:19|20)[0-9]{2}[-\\/ ]?(0?[1-9]|1[0-2])[-/ ]?(0?[1-9]|[12][0-9]|3[01])',
+    'date_input': 'Введите дату транзакции (формат ГГГГ-ММ-ДД):\n ... ',
+
+    'type': 'Категория',
+    'values_for_type': {'income': 'Доход', 'expense': 'Расход'},
+    'type_input': 'Введите категорию транзакции (Доход или Расход):\n ... ',
+
+    'amount': 'Сумма',
+    'amount_type': int,
+    'amount_input': 'Введите сумму транзакции (числовое значение):\n ... ',
+
+    'descr': 'Описание',
+    'descr_input': 'Введите описание к транзакции:\n ... ',
+
+    'agree_disagree': {'да': True, 'нет': False},
+}
@@ -1,12 +1,31 @@
-from handlers import SetLanguageHandler, WelcomeHandler, ShowTutorialHandler, ChooseCommandHandler, \
+import argparse
+import os
+import sys
+from typing import Iterable
+
+from handlers import SetLanguageHandler, WelcomeHandler, ShowTutorialHandler, ChooseCommandHandler, PagerMixin, \
     commands, database_fields
-from languages import eng_lang
-from signals import ExitSignal
+from instrumentation import instrumentation
+from languages import LanguagePack, default_language, get_lang_codes, load_language
+from signals import ExitSignal, WriteFailedSignal
+
+
+def open_store(database_path: str, background_writes: bool = False):
+    """
+    Opens the database. The storage layer, and pandas and numpy with it, is imported only here,
+    so the program starts and shows its first prompts without loading them.
+    """
+    from storage import LedgerStore
+
+    return LedgerStore(database_path, background_writes=background_writes)
 
 
-def run(tutorial_steps: tuple[str]):
+def run(tutorial_steps: tuple[str], database_path: str = 'database.csv', page_size: int = PagerMixin.page_size):
+    # Lists of records are shown in pages of this size
+    PagerMixin.page_size = page_size
+
     # Setting the interface language
-    select_language_handler = SetLanguageHandler(eng_lang)
+    select_language_handler = SetLanguageHandler(load_language(default_language))
     language = select_language_handler.operate()
 
     start_handler = WelcomeHandler(language)
@@ -15,18 +34,88 @@ def run(tutorial_steps: tuple[str]):
         show_tutorial_handler = ShowTutorialHandler(language, tutorial_steps)
         show_tutorial_handler.operate()
 
+    # The database file is parsed once per session and shared by all handlers.
+    # It is opened when the first command is chosen. Added and changed records are written in the background,
+    # so the next prompt does not wait for the disk
+    store = None
+    # Names of the commands for the timings
+    command_names = {handler_class: command for command, handler_class in commands.items()}
+
     # An infinite loop that prompts the user for a command to execute.
     # After receiving a command in string representation, calls the corresponding handler from the commands dictionary
 
     while True:
         try:
-            choose_command_handler = ChooseCommandHandler(language, commands)
-            command_class = choose_command_handler.operate()(language, database_fields)
-            command_class.operate()
-        except ExitSignal:  # Waits for an 'exit' signal from the user to terminate the command early
-            pass
+            try:
+                choose_command_handler = ChooseCommandHandler(language, commands)
+                handler_class = choose_command_handler.operate()
+                if store is None:
+                    store = open_store(database_path, background_writes=True)
+
+                command_class = handler_class(language, database_fields, store)
+                with instrumentation.command(command_names[handler_class]):
+                    command_class.operate()
+            except ExitSignal:  # Waits for an 'exit' signal from the user to terminate the command early
+                # Whatever was committed before "exit" is on the disk when the prompt returns
+                if store is not None:
+                    store.flush()
+        # A commit written in the background failed. It is reported by whichever command waited for it next,
+        # the session goes on with the table read again from the disk
+        except WriteFailedSignal as error:
+            print(language.get('write_failed').format(error=error.error))
+
+
+def run_batch(lines: Iterable[str], database_path: str = 'database.csv', language: LanguagePack = None) -> int:
+    """
+    Non-interactive mode: executes "add" and "find" commands line by line and writes all added records at once.
+    Returns the number of rejected lines.
+    """
+    # The batch mode works with the data from the first line, so pandas is imported right away
+    from batch import BatchRunner
+
+    language = language or load_language(default_language)
+    return BatchRunner(language, database_fields, open_store(database_path)).run(lines)
 
 
 if __name__ == '__main__':
-    tutorial = ('short_description', 'show', 'add', 'find', 'change')
-    run(tutorial)
+    parser = argparse.ArgumentParser(description='Personal financial wallet')
+    parser.add_argument('--database', default='database.csv',
+                        help='path to the database, its extension defines the format: .csv or .ledger (columnar)')
+    parser.add_argument('--export', metavar='PATH',
+                        help='write the database to PATH in the format defined by its extension and exit')
+    parser.add_argument('--page-size', type=int, default=PagerMixin.page_size,
+                        help='maximum number of records shown at once by the show and find commands')
+    parser.add_argument('--batch', metavar='FILE',
+                        help='execute the commands of FILE ("-" for the standard input) without prompts and exit')
+    parser.add_argument('--language', choices=get_lang_codes(), default=default_language,
+                        help='language of the messages of the batch mode')
+    parser.add_argument('--profile', nargs='?', const='1', metavar='COMMAND',
+                        help='print the time spent by every command on exit, '
+                             'the first run of COMMAND is also profiled with cProfile')
+    args = parser.parse_args()
+    if args.page_size < 1:
+        parser.error('--page-size must be a positive number')
+
+    # Timings are also switched on by the environment variable, e.g. LEDGER_PROFILE=1 or LEDGER_PROFILE=find
+    profile = args.profile or os.environ.get('LEDGER_PROFILE')
+    if profile:
+        if profile != '1' and profile not in commands:
+            parser.error(f'cannot profile an unknown command: {profile}')
+        instrumentation.enable(profiled_command=None if profile == '1' else profile)
+
+    if args.export:
+        try:
+            open_store(args.database).export(args.export)
+        except ValueError as error:  # Records the target format cannot hold are not dropped silently
+            sys.exit(f'Cannot export {args.database} to {args.export}: {error}')
+    elif args.batch:
+        language = load_language(args.language)
+        if args.batch == '-':
+            rejected = run_batch(sys.stdin, args.database, language)
+        else:
+            with open(args.batch, encoding='utf-8') as file:
+                rejected = run_batch(file, args.database, language)
+        sys.exit(1 if rejected else 0)
+    else:
+        tutorial = ('short_description', 'show', 'add', 'find', 'change')
+        run(tutorial, args.database, args.page_size)
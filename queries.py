@@ -0,0 +1,91 @@
+from __future__ import annotations
+
+import operator
+from typing import NamedTuple, TYPE_CHECKING
+
+if TYPE_CHECKING:
+    import numpy as np
+
+
+def contains_words(column: np.ndarray, value: str) -> np.ndarray:
+    """Checks that every word of the value is a word of the text, ignoring case."""
+    import numpy as np
+    from indexes import tokenize
+
+    words = set(tokenize(value))
+    return np.fromiter((bool(words) and words <= set(tokenize(text)) for text in column), dtype=bool, count=len(column))
+
+
+def contains_prefixes(column: np.ndarray, value: str) -> np.ndarray:
+    """Checks that every word of the value starts some word of the text, ignoring case."""
+    import numpy as np
+    from indexes import tokenize
+
+    prefixes = tokenize(value)
+
+    def matches(text) -> bool:
+        words = tokenize(text)
+        return all(any(word.startswith(prefix) for word in words) for prefix in prefixes)
+
+    return np.fromiter((bool(prefixes) and matches(text) for text in column), dtype=bool, count=len(column))
+
+
+# Comparison operators available in filters. Each is applied to a whole column at once
+operations = {
+    '==': operator.eq,
+    '>': operator.gt,
+    '>=': operator.ge,
+    '<': operator.lt,
+    '<=': operator.le,
+    # Word search in texts: the store answers them by the text index instead of checking every row
+    '~=': contains_words,
+    '^=': contains_prefixes,
+}
+text_operations = ('~=', '^=')
+
+
+class Condition(NamedTuple):
+    """A single filter condition: field, comparison operation and the value entered by the user."""
+    field: str
+    operation: str
+    value: str
+
+    def evaluate(self, column: np.ndarray) -> np.ndarray:
+        """Compares every element of the column with the value and returns a boolean mask."""
+        # Imported on the first comparison, so the conditions can be built before the data is loaded
+        import numpy as np
+        from indexes import parse_dates
+
+        value = self.value
+
+        # The value is converted to the type of the column: a number, a date or a string
+        if column.dtype.kind in 'iuf':
+            value = column.dtype.type(value)
+        elif column.dtype.kind == 'M':
+            value = parse_dates([value])[0]
+
+        return np.asarray(operations[self.operation](column, value), dtype=bool)
+
+
+class Query:
+    """
+    Conjunction of conditions over the table of the store.
+    The first condition is answered by the store, which caches the result for each condition.
+    Every next condition is checked only for the rows that passed the previous ones,
+    narrowing the array of their positions.
+    """
+
+    def __init__(self, store):
+        self.store = store
+        self.conditions = []
+        self.positions = None
+
+    def refine(self, condition: Condition) -> np.ndarray:
+        """Adds a condition to the query and returns positions of the rows that satisfy all conditions."""
+        if self.positions is None:
+            self.positions = self.store.select(condition)
+        else:
+            self.positions = self.positions[self.store.evaluate(condition, self.positions)]
+
+        self.conditions.append(condition)
+        return self.positions
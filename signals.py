@@ -1,2 +1,21 @@
 class ExitSignal(Exception):
-    pass
\ No newline at end of file
+    pass
+
+
+class WriteFailedSignal(Exception):
+    """A commit handed off to the background writer could not be written. Raised in the session by the next wait."""
+
+    def __init__(self, error: Exception):
+        super().__init__(error)
+        # The original error of the writer thread
+        self.error = error
+
+
+class InvalidInputSignal(Exception):
+    """A value that did not pass validation outside the interactive mode, where it cannot be asked again."""
+
+    def __init__(self, err_code: str, field: str = None):
+        super().__init__(err_code, field)
+        # Key of the error message in the language pack and the field whose value was rejected
+        self.err_code = err_code
+        self.field = field
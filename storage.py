@@ -0,0 +1,679 @@
+import atexit
+import itertools
+import os
+import queue
+import threading
+from typing import Callable, Iterable
+
+import numpy as np
+import pandas as pd
+
+from backends import FrameTable, get_backend
+from indexes import Aggregates, DateIndex, TextIndex, parse_dates
+from instrumentation import timed
+from queries import Condition, text_operations
+from signals import WriteFailedSignal
+from wal import WriteAheadLog
+
+try:
+    import fcntl
+except ImportError:  # Advisory locks are not available on Windows
+    fcntl = None
+
+
+class KeyAllocator:
+    """
+    Hands out primary keys from a persistent high-water mark stored in a small sidecar file.
+    Keys are never reused, even if records are removed or the database file is edited by hand.
+    The sidecar is locked while a key is taken, so several processes may add records to the same database.
+    """
+
+    def __init__(self, path: str, seed: Callable[[], int]):
+        self.path = path
+        # Called once to find the first free key when the sidecar does not exist yet
+        self.seed = seed
+
+    def allocate(self, count: int = 1) -> int:
+        """Reserves "count" consecutive keys and returns the first of them."""
+        return self._update(lambda first: first + count)
+
+    def ensure_above(self, pk: int) -> None:
+        """Moves the high-water mark past a key that was written into the database bypassing the allocator."""
+        self._update(lambda first: max(first, pk + 1))
+
+    def _update(self, get_next: Callable[[int], int]) -> int:
+        fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            if fcntl:
+                fcntl.flock(fd, fcntl.LOCK_EX)
+
+            stored = os.read(fd, 32).strip()
+            first = int(stored) if stored else self.seed()
+            following = get_next(first)
+
+            if following != first or not stored:
+                data = str(following).encode()
+                os.pwrite(fd, data, 0)
+                os.ftruncate(fd, len(data))
+                os.fsync(fd)
+        finally:
+            os.close(fd)  # Closing the descriptor also releases the lock
+
+        return first
+
+
+class WriterLock:
+    """
+    Advisory lock that serializes the commits of all processes working with the same database.
+    It is taken only for writing the files, never while the user enters values, and readers never take it.
+    The lock is reentrant, so a commit may run a checkpoint without releasing it. It also excludes
+    the other threads of the process, which share the descriptor and would not be stopped by the file lock.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._fd = None
+        self._depth = 0
+        self._thread_lock = threading.RLock()
+
+    def __enter__(self) -> 'WriterLock':
+        self._thread_lock.acquire()
+        if not self._depth:
+            fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+            if fcntl:
+                fcntl.flock(fd, fcntl.LOCK_EX)
+            self._fd = fd
+        self._depth += 1
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self._depth -= 1
+        if not self._depth:
+            os.close(self._fd)  # Closing the descriptor also releases the lock
+            self._fd = None
+        self._thread_lock.release()
+
+
+class BackgroundWriter:
+    """
+    Thread that writes the commits of the session, so the next prompt is shown without waiting for the disk.
+    Commits that pile up while it writes are written together: under one lock, with one fsync per file
+    and one check for a checkpoint. The queue is bounded, so a session that commits faster than the disk
+    writes eventually waits for it.
+
+    The session waits for the queue to drain before it reads the database again, and when the program exits.
+    """
+
+    def __init__(self, store: 'LedgerStore', queue_size: int):
+        self.store = store
+        self.queue = queue.Queue(queue_size)
+        # Error of a failed write, raised in the session by the next flush
+        self.error = None
+
+        self.thread = threading.Thread(target=self._run, name='ledger-writer', daemon=True)
+        self.thread.start()
+        atexit.register(self.flush)
+
+    def submit(self, operation: str, *arguments) -> None:
+        """Hands off a commit: "add" with the frame of the records, or "change" with the keys and the new values."""
+        self.queue.put((operation, arguments))
+
+    def flush(self) -> None:
+        """Waits until all handed off commits are durably written. Raises WriteFailedSignal if a write failed."""
+        # The writer itself reads the table while writing
+        if threading.current_thread() is self.thread:
+            return
+
+        self.queue.join()
+        if self.error is not None:
+            error, self.error = self.error, None
+            raise WriteFailedSignal(error) from error
+
+    def _run(self) -> None:
+        while True:
+            commits = [self.queue.get()]
+            while True:
+                try:
+                    commits.append(self.queue.get_nowait())
+                except queue.Empty:
+                    break
+
+            try:
+                self.store._write(commits)
+            except Exception as error:
+                self.error = error
+            finally:
+                for _ in commits:
+                    self.queue.task_done()
+
+
+class LedgerStore:
+    """
+    Session-level access point to the database file.
+    The storage format is defined by the backend chosen by the extension of the path.
+    The table is opened once and kept for the whole session. The file is read again only if it was changed
+    from outside the session, which is detected by its modification time and size.
+    A CSV file is read into memory, while the columnar format is never loaded as a whole:
+    its columns are paged in only when they are touched.
+
+    Changed records, and new records of a format that cannot append them safely (CSV), are committed to
+    the write-ahead log next to the file. The log is replayed on top of the file when the table is opened.
+    When the log outgrows a share of the file, a checkpoint rewrites the file with the log folded into it:
+    the new file is written aside and swapped with the old one, so a crash at any moment loses nothing.
+
+    Several processes may work with the same database. Commits are serialized by the writer lock and are
+    computed from the latest state of the table, so concurrent commits do not overwrite each other.
+    Reads take no lock: the table is read optimistically and read again if a checkpoint replaced
+    the file in the meantime, so every opened table is a consistent snapshot.
+    """
+
+    # The log is folded into the file when it grows beyond 1/checkpoint_ratio of the file,
+    # so the cost of rewriting the file is spread over the commits. Smaller logs are never folded
+    checkpoint_ratio = 8
+    checkpoint_min_size = 1 << 20
+    # Optimistic reads of a table that keeps being replaced, after which the read waits for the writers
+    read_attempts = 3
+    # Commits handed off to the background writer and not written yet, beyond which the session waits for the disk
+    write_queue_size = 64
+
+    def __init__(self, path: str = 'database.csv', background_writes: bool = False):
+        self.path = path
+        self.backend = get_backend(path)
+        self.wal = WriteAheadLog(f'{path}.wal')
+        self.writer_lock = WriterLock(f'{path}.lock')
+        self._table = None
+        self._signature = None
+        # Position in the write-ahead log up to which its records are applied to the opened table
+        self._log_position = None
+
+        self.keys = KeyAllocator(f'{path}.pk', seed=self._get_next_key)
+        self.aggregates = Aggregates(f'{path}.stats')
+        self.text_index = TextIndex(f'{path}.text')
+
+        # Built once for the opened table and extended with the dates of appended records
+        self._date_index = None
+        self._pending_dates = []
+        # Columns of the table prepared for comparisons and positions of the rows matching filter conditions
+        self._columns = {}
+        self._selections = {}
+
+        # With background writes, records are added and changed by the writer thread
+        self.writer = BackgroundWriter(self, self.write_queue_size) if background_writes else None
+
+    def _get_signature(self) -> tuple[int, ...]:
+        """Modification time and size of the database file and of its write-ahead log."""
+        return *self.backend.stat(), *self.wal.stat()
+
+    def _reset(self) -> None:
+        """Drops everything that was derived from the previous state of the table."""
+        self._date_index = None
+        self._pending_dates = []
+        self._columns = {}
+        self._selections = {}
+
+    @timed('io')
+    def _open(self):
+        """
+        Returns the table, re-opening the file only if it has changed since the last access.
+        The commits handed off to the background writer are waited for first, so the table includes them.
+        """
+        self.flush()
+        return self._get_table()
+
+    def _get_table(self):
+        """
+        Part of _open() that does not wait for the background writer. Used under the writer lock,
+        which the writer needs to finish its commits: waiting for it there would never end.
+        """
+        signature = self._get_signature()
+
+        if self._table is None or signature != self._signature:
+            if self._table is not None and self._refresh(signature):
+                return self._table
+
+            table, signature, self._log_position = self._read_snapshot(signature)
+
+            self._table = table
+            self._signature = signature
+            self._reset()
+
+            if len(table):
+                self.keys.ensure_above(int(np.max(table.keys)))
+
+        return self._table
+
+    def _refresh(self, signature: tuple[int, ...]) -> bool:
+        """
+        Applies the commits made by other processes since the table was read, if they only added records to the log.
+        Returns False if the file itself was replaced, so it has to be read again.
+        """
+        if signature[:2] != self._signature[:2]:
+            return False
+
+        records, position = self.wal.read(self._log_position)
+        if records is None or self.backend.stat() != signature[:2]:
+            return False
+
+        self._replay(self._table, records)
+        self._signature = signature
+        self._log_position = position
+        self._reset()
+        return True
+
+    def _read_snapshot(self, signature: tuple[int, ...]):
+        """
+        Reads the file and replays the log on top of it. Commits only add whole records to the end of the log,
+        so any prefix of it is consistent with the file. Only a checkpoint, which replaces the file and then
+        empties the log, may pair them wrongly. The read is repeated then. The signature taken before
+        the successful read is returned with the table, so the table is refreshed if anything was committed during it.
+        """
+        for _ in range(self.read_attempts):
+            try:
+                table, position = self._read_table()
+            except FileNotFoundError:
+                # Checkpoints removed the version of the table that was being read
+                signature = self._get_signature()
+                continue
+            current = self._get_signature()
+            if current[:2] == signature[:2]:
+                return table, signature, position
+            signature = current
+
+        # Checkpoints follow each other faster than the file is read, the writers are waited for
+        with self.writer_lock:
+            signature = self._get_signature()
+            table, position = self._read_table()
+            return table, signature, position
+
+    def _read_table(self):
+        table = self.backend.open()
+        records, position = self.wal.read()
+        self._replay(table, records)
+        return table, position
+
+    @staticmethod
+    def _replay(table, records: list[tuple[str, pd.DataFrame]]) -> None:
+        """Applies the records of the write-ahead log to the table."""
+        for operation, frame in records:
+            if operation == 'add':
+                # A checkpoint interrupted after the file was replaced leaves the records in both places
+                table.append(frame[~frame.index.isin(table.keys)])
+            else:
+                # The last change of a record wins
+                table.apply_changes(frame[~frame.index.duplicated(keep='last')])
+
+    def _commit(self, operation: str, frame: pd.DataFrame, sync: bool = True) -> None:
+        """Durably writes the records: new ones to the end of the file if it is safe, the rest to the log."""
+        if operation == 'add' and self.backend.atomic_append:
+            self.backend.append(frame, sync=sync)
+        else:
+            self.wal.append(operation, frame, sync=sync)
+
+    def _sync(self, operations: set[str]) -> None:
+        """Flushes to the disk the files written by the commits made with sync=False."""
+        if 'add' in operations and self.backend.atomic_append:
+            self.backend.sync()
+        if operations - {'add'} or operations and not self.backend.atomic_append:
+            self.wal.sync()
+
+    def _checkpoint_if_needed(self) -> None:
+        """Called under the writer lock after a commit."""
+        if self.wal.size > max(self.checkpoint_min_size, self.backend.stat()[1] // self.checkpoint_ratio):
+            self._compact()
+
+    def load(self) -> pd.DataFrame:
+        """Returns the whole table as a DataFrame. Used where all records are needed at once, e.g. on compaction."""
+        return self._open().to_frame()
+
+    @timed('io')
+    def take(self, positions: np.ndarray) -> pd.DataFrame:
+        """Returns the records at the given positions of the table."""
+        return self._open().take(positions)
+
+    def get_keys(self, positions: np.ndarray) -> pd.Index:
+        """Returns the primary keys of the records at the given positions without reading the other columns."""
+        return self._open().keys[positions]
+
+    def append(self, entity: dict[str, str | int]) -> int:
+        """
+        Durably writes a single record to the end of the table. Its cost does not depend on the size of the table.
+        Returns the primary key assigned to the record.
+        """
+        return self.append_many([entity])
+
+    @timed('io')
+    def append_many(self, entities: list[dict[str, str | int]] | pd.DataFrame) -> int:
+        """
+        Durably writes the records to the end of the table with one write per file followed by fsync.
+        Keys for all of them are allocated at once. Returns the primary key assigned to the first record.
+        With background writes only the keys are allocated before returning.
+        """
+        frame = pd.DataFrame(entities).astype({'amount': np.int64})
+        first = self.keys.allocate(len(frame.index))
+        frame.index = pd.RangeIndex(first, first + len(frame.index), name='pk')
+
+        if self.writer:
+            self.writer.submit('add', frame)
+            return first
+
+        with self.writer_lock:
+            self._append(frame)
+            self._checkpoint_if_needed()
+        return first
+
+    def _load_sidecars(self, signature: tuple[int, ...]) -> tuple[bool, bool]:
+        """
+        Returns whether the statistics and the text index match the given state of the database.
+        Sidecars not read by this session yet are read first, so commits made before the first show
+        or word search keep them up to date, and these commands do not have to read the table.
+        """
+        stats_in_sync = self.aggregates.signature == signature or self.aggregates.load(signature)
+        text_in_sync = self.text_index.signature == signature or self.text_index.load(signature)
+        return stats_in_sync, text_in_sync
+
+    def _append(self, frame: pd.DataFrame, sync: bool = True) -> None:
+        """Commits the records with allocated keys and adds them to the opened table and to the statistics."""
+        # The opened table and the statistics stay valid only if nobody has changed the file since they were read
+        signature = self._get_signature()
+        in_sync = self._table is not None and signature == self._signature
+        stats_in_sync, text_in_sync = self._load_sidecars(signature)
+
+        self._commit('add', frame, sync=sync)
+
+        signature = self._get_signature()
+        if text_in_sync:
+            self.text_index.add(self.text_index.rows, frame.descr)
+            self.text_index.dump(signature)
+        if in_sync:
+            self._table.append(frame)
+            self._signature = signature
+            self._log_position = self.wal.position
+            self._pending_dates += frame.date.tolist()
+            self._columns = {}
+            self._selections = {}
+        if stats_in_sync:
+            self.aggregates.add_many(frame)
+            self.aggregates.dump(signature)
+
+    @timed('io')
+    def append_frames(self, frames: Iterable[pd.DataFrame]) -> int:
+        """
+        Appends records coming in chunks, e.g. from a large import, without keeping them all in memory.
+        Keys for every chunk are allocated at once, and the files are flushed to the disk once, after the last chunk.
+        Either all records are appended or, if reading a chunk fails, none of them. Returns the number of them.
+        """
+        self.flush()
+        with self.writer_lock:
+            stats_in_sync, text_in_sync = self._load_sidecars(self._get_signature())
+            count = 0
+
+            # Sizes the chunks already written are cut back to if a later one fails.
+            # The keys allocated for them are not given out again, as any allocated key
+            log_size = self.wal.size
+            rows = self.backend.rows if self.backend.atomic_append else None
+
+            try:
+                for frame in frames:
+                    if not len(frame.index):
+                        continue
+
+                    first = self.keys.allocate(len(frame.index))
+                    frame = frame.astype({'amount': np.int64}).set_axis(
+                        pd.RangeIndex(first, first + len(frame.index), name='pk')
+                    )
+                    self._commit('add', frame, sync=False)
+                    count += len(frame.index)
+
+                    if stats_in_sync:
+                        self.aggregates.add_many(frame)
+                    if text_in_sync:
+                        self.text_index.add(self.text_index.rows, frame.descr)
+            except BaseException:
+                if rows is not None:
+                    self.backend.truncate(rows)
+                self.wal.truncate(log_size)
+
+                # The statistics and the text index were updated in memory only, they are read again from the disk
+                self.aggregates.signature = None
+                self.text_index.signature = None
+                self._table = None
+                self._reset()
+                raise
+
+            if count:
+                self._sync({'add'})
+
+            # The table is opened again on the next access instead of keeping all imported records in memory
+            self._table = None
+            self._reset()
+            if stats_in_sync:
+                self.aggregates.dump(self._get_signature())
+            if text_in_sync:
+                self.text_index.dump(self._get_signature())
+
+            self._checkpoint_if_needed()
+            return count
+
+    @timed('io')
+    def update(self, keys: pd.Index, values: dict[str, str | int]) -> None:
+        """
+        Sets new values of the given fields for the records with the given keys.
+        Only the changed records are committed to the write-ahead log, with one write followed by fsync.
+        With background writes the change is only handed off to the writer.
+        """
+        if self.writer:
+            self.writer.submit('change', keys, values)
+            return
+
+        with self.writer_lock:
+            self._update(keys, values)
+            self._checkpoint_if_needed()
+
+    def _update(self, keys: pd.Index, values: dict[str, str | int], sync: bool = True) -> None:
+        """Commits the new values and applies them to the opened table and to the statistics."""
+        # The rows are taken from the latest state of the table, so the fields changed by other processes
+        # since the records were found are not overwritten with their old values
+        table = self._get_table()
+        stats_in_sync, text_in_sync = self._load_sidecars(self._signature)
+
+        old_rows = table.get_rows(keys)
+        new_rows = old_rows.copy()
+        for field, value in values.items():
+            new_rows[field] = value
+        new_rows = new_rows.astype(old_rows.dtypes.to_dict())
+
+        self._commit('change', new_rows, sync=sync)
+
+        table.apply_changes(new_rows)
+        self._signature = self._get_signature()
+        self._log_position = self.wal.position
+
+        # Only the changed columns have to be prepared again
+        if 'date' in values:
+            self._date_index = None
+            self._pending_dates = []
+        for field in values:
+            self._columns.pop(field, None)
+        self._selections = {}
+
+        if stats_in_sync:
+            for old_row, new_row in zip(old_rows.to_dict('records'), new_rows.to_dict('records')):
+                self.aggregates.add(old_row, sign=-1)
+                self.aggregates.add(new_row)
+            self.aggregates.dump(self._signature)
+
+        if text_in_sync:
+            if 'descr' in values:
+                self.text_index.change(table.locate(keys), new_rows.descr)
+            self.text_index.dump(self._signature)
+
+    def _write(self, commits: list[tuple[str, tuple]]) -> None:
+        """
+        Writes the commits handed off to the background writer, in their order, under one lock and with
+        one fsync per file. Records added one after another are committed as one record.
+        """
+        with self.writer_lock:
+            try:
+                for operation, group in itertools.groupby(commits, key=lambda commit: commit[0]):
+                    arguments = [arguments for _, arguments in group]
+                    if operation == 'add':
+                        self._append(pd.concat([frame for frame, in arguments]), sync=False)
+                    else:
+                        for keys, values in arguments:
+                            self._update(keys, values, sync=False)
+                self._sync({operation for operation, _ in commits})
+            except Exception:
+                # Some of the commits may be lost, the table is read again from what is on the disk
+                self._table = None
+                self._reset()
+                raise
+
+            self._checkpoint_if_needed()
+
+    def flush(self) -> None:
+        """Waits for the commits handed off to the background writer, if there is one."""
+        if self.writer:
+            self.writer.flush()
+
+    @timed('io')
+    def save(self, frame: pd.DataFrame) -> None:
+        """
+        Overwrites the file with the given table and empties the write-ahead log.
+        The log is emptied only after the new file has replaced the old one.
+        """
+        self.flush()
+        with self.writer_lock:
+            self._save(frame)
+
+    def _save(self, frame: pd.DataFrame) -> None:
+        """Part of save() done under the writer lock."""
+        self.backend.write(frame)
+        self.wal.reset()
+
+        # The table is opened again on the next access
+        self._table = None
+        self._reset()
+        self.aggregates.rebuild(FrameTable(frame), self._get_signature())
+
+    def date_index(self) -> DateIndex:
+        """Returns the index of the table by date, building it on first use."""
+        table = self._open()
+
+        if self._date_index is None:
+            self._date_index = DateIndex(self.column('date'))
+        elif self._pending_dates:
+            self._date_index.extend(
+                parse_dates(self._pending_dates), first_position=len(table) - len(self._pending_dates)
+            )
+        self._pending_dates = []
+
+        return self._date_index
+
+    def column(self, field: str) -> np.ndarray:
+        """Returns a whole column of the table as an array ready for comparisons. Dates are returned parsed."""
+        table = self._open()
+
+        if field not in self._columns:
+            self._columns[field] = table.column(field)
+        return self._columns[field]
+
+    @timed('query')
+    def select(self, condition: Condition) -> np.ndarray:
+        """
+        Returns positions of the rows satisfying the condition, in table order.
+        Results are cached until the table changes. Conditions on the date are answered by the date index,
+        word searches by the text index.
+        """
+        table = self._open()
+
+        if condition not in self._selections:
+            if condition.field == 'date':
+                positions = np.sort(self.date_index().select(condition.operation, condition.value))
+            elif condition.operation in text_operations:
+                positions = self.get_text_index().select(condition.operation, condition.value)
+            else:
+                positions = np.flatnonzero(table.evaluate(condition))
+            self._selections[condition] = positions
+
+        return self._selections[condition]
+
+    @timed('query')
+    def evaluate(self, condition: Condition, positions: np.ndarray) -> np.ndarray:
+        """
+        Checks the condition only for the rows at the given positions and returns a boolean mask.
+        A column already prepared for an earlier condition is reused, otherwise only the given rows are read.
+        """
+        if condition.operation in text_operations:
+            return np.isin(positions, self.select(condition))
+
+        table = self._open()
+        if condition.field in self._columns:
+            return condition.evaluate(self._columns[condition.field][positions])
+        return table.evaluate(condition, positions)
+
+    def get_text_index(self) -> TextIndex:
+        """
+        Returns the index of the words of the descriptions. It is read from its sidecar if that matches the file,
+        otherwise it is built from the descriptions of the table.
+        """
+        table = self._open()
+
+        if self.text_index.signature != self._signature and not self.text_index.load(self._signature):
+            self.text_index.rebuild(table.column('descr'), self._signature)
+
+        # Consistency check against the table, as for the statistics
+        elif self.text_index.rows != len(table):
+            self.text_index.rebuild(table.column('descr'), self._signature)
+
+        return self.text_index
+
+    @timed('query')
+    def statistic(self) -> Aggregates:
+        """
+        Returns income/expense statistics of the database.
+        While the sidecar matches the file, the table itself is not read at all.
+        """
+        self.flush()
+        signature = self._get_signature()
+
+        if self.aggregates.signature != signature and not self.aggregates.load(signature):
+            self.aggregates.rebuild(self._open(), self._signature)
+
+        # Consistency check against the table, if it is already opened
+        elif self._table is not None and signature == self._signature and self.aggregates.rows != len(self._table):
+            self.aggregates.rebuild(self._table, self._signature)
+
+        return self.aggregates
+
+    def _get_next_key(self) -> int:
+        """Finds the first free key by reading only the key column of the table and the records of the log."""
+        if self._table is not None:
+            keys = self._table.keys
+        else:
+            records, _ = self.wal.read()
+            added = [frame.index for operation, frame in records if operation == 'add']
+            keys = np.concatenate([self.backend.read_keys(), *added])
+        return int(np.max(keys)) + 1 if len(keys) else 0
+
+    def export(self, path: str) -> None:
+        """
+        Writes the current table to another database in the format defined by its extension.
+        Used to import a CSV file into the columnar format and to export it back.
+        """
+        get_backend(path).write(self.load())
+
+    def compact(self) -> None:
+        """Checkpoint: rewrites the whole file from the current table, folding the write-ahead log into it."""
+        # The background writer needs the lock to finish its commits, so they are waited for before taking it
+        self.flush()
+        with self.writer_lock:
+            self._compact()
+
+    def _compact(self) -> None:
+        """Part of compact() done under the writer lock, also run by the commits that outgrow the log."""
+        _, text_in_sync = self._load_sidecars(self._get_signature())
+        self._save(self._get_table().to_frame())
+
+        # The rows keep their positions in the new file, so the text index stays valid for it
+        if text_in_sync:
+            self.text_index.dump(self._get_signature(), full=True)
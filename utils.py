@@ -1,8 +1,12 @@
+import sys
 from typing import Optional
 
+from instrumentation import timed
+
 
 class PrettyPrintMixin:
     @staticmethod
+    @timed('render')
     def pprint(obj, **kwargs):
         """
         The function is passed as an argument to the apply function.
@@ -20,6 +24,85 @@ class PrettyPrintMixin:
             print(f"{language.get(field)}: {field_value}")
         print('\n------------------------------\n')
 
+    @staticmethod
+    @timed('render')
+    def pprint_many(frame, fields, language) -> None:
+        """
+        Displays all records of the table in the same form as pprint, but column by column.
+        Labels and aliases are resolved once for each field, the whole block is written to the screen at once.
+        """
+        if not len(frame):
+            return
+
+        # The records come from the store, which has already loaded numpy
+        import numpy as np
+
+        records = None
+        for field, field_attrs in fields.items():
+            column = frame[field].astype(object)
+
+            # Values with aliases are replaced for the whole column at once
+            aliases = language.get(field_attrs.validator_arg_code)
+            if isinstance(aliases, dict):
+                column = column.map({k: v.capitalize() for k, v in aliases.items()}).fillna(column)
+
+            line = f"{language.get(field)}: " + np.asarray(column, dtype=str).astype(object)
+            records = line if records is None else records + '\n' + line
+
+        sys.stdout.write(''.join(records + '\n\n------------------------------\n\n'))
+
+
+def paginate(positions, page_size: int):
+    """
+    Generator of pages of at most page_size records. Yields the page number, the number of pages
+    and the positions of the records on the page. The step to the next shown page is sent to the generator:
+    1 - the next page, -1 - the previous one. Records themselves are not touched, so a page costs the same
+    regardless of how many records there are.
+    """
+    count = max(1, -(-len(positions) // page_size))
+    number = 0
+
+    while True:
+        step = yield number, count, positions[number * page_size:(number + 1) * page_size]
+        number = min(max(number + (step or 0), 0), count - 1)
+
+
+class TranslationCache:
+    """
+    Validators of aliases and reverse alias maps for the option sets of the current language.
+    Each of them is built once for an option set and dropped when the language changes.
+    """
+
+    # Option sets that are built anew for every prompt would otherwise fill the cache
+    max_size = 256
+
+    def __init__(self):
+        self.language = None
+        # {(id of the option set, error code): (option set, validator of aliases, {alias: value})}
+        self.entries = {}
+
+    def get(self, language: dict, validator) -> tuple[object, dict[str, str]]:
+        if language is not self.language or len(self.entries) >= self.max_size:
+            self.language = language
+            self.entries = {}
+
+        # The option set itself is kept in the entry, so its id cannot be reused by another object
+        key = (id(validator.options), validator.err_code)
+        entry = self.entries.get(key)
+        if entry is None or entry[0] is not validator.options:
+            options = validator.options
+            entry = (
+                options,
+                validator.__class__(options.values(), validator.err_code),
+                {v: k for k, v in options.items()},
+            )
+            self.entries[key] = entry
+
+        return entry[1], entry[2]
+
+
+translations = TranslationCache()
+
 
 def translate_dict(func: callable) -> callable:
     """
@@ -28,12 +111,12 @@ def translate_dict(func: callable) -> callable:
     This function detects the entry of such fields and performs a double translation.
     First, the value from the database is replaced with its alias.
     After the user selects an alias, the reverse translation occurs and the database structure does not change.
+    Validators of aliases and reverse maps are taken from the cache of the current language.
     """
     def wrapper(self, message: str, validator: Optional[callable]) -> str:
         if validator and hasattr(validator, 'options') and isinstance(validator.options, dict):
-            new_validator = validator.__class__(validator.options.values(), validator.err_code)
+            new_validator, reversed_options = translations.get(self.language, validator)
             result = func(self, message, new_validator)
-            reversed_options = {v: k for k, v in validator.options.items()}
             return reversed_options[result]
 
         return func(self, message, validator)
@@ -1,5 +1,22 @@
+from __future__ import annotations
+
+import os
 import re
+import warnings
 from abc import ABC, abstractmethod
+from functools import lru_cache
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    import numpy as np
+    import pandas as pd
+
+
+# Validators are created anew for every prompt, while their patterns are compiled only once
+compile_pattern = lru_cache(maxsize=None)(re.compile)
+
+# Whole numbers that fit into the int64 column of the table
+integer_pattern = re.compile(r'\s*[+-]?\d{1,18}\s*')
 
 
 class AbstractValidator(ABC):
@@ -10,27 +27,70 @@ class AbstractValidator(ABC):
     def validate(self, user_entered):
         pass
 
+    def validate_many(self, values: pd.Series) -> np.ndarray:
+        """
+        Checks a whole column of strings and returns a boolean mask of the valid values.
+        Unlike validate(), "exit" is an ordinary value here, since there is no user to leave the input.
+        """
+        import numpy as np
+
+        return np.fromiter(
+            (value != 'exit' and self.validate(value) for value in values), dtype=bool, count=len(values)
+        )
+
 
 class RegExValidator(AbstractValidator):
     def __init__(self, regex: str, err_code: str = 'notfound_command'):
         super().__init__(err_code)
         self.regex = regex
+        self.pattern = compile_pattern(regex)
 
     def validate(self, user_entered) -> bool:
         if user_entered == 'exit':
             return True
-        return re.search(self.regex, user_entered) is not None
+        return self.pattern.search(user_entered) is not None
+
+    def validate_many(self, values: pd.Series) -> np.ndarray:
+        # Pandas warns that the groups of the pattern are not extracted, only the fact of a match is needed here
+        with warnings.catch_warnings():
+            warnings.filterwarnings('ignore', 'This pattern is interpreted as a regular expression')
+            return values.str.contains(self.pattern, regex=True).to_numpy(dtype=bool)
+
+
+class DateValidator(RegExValidator):
+    """Besides the spelling checked by the pattern, requires the value to be a real date (not e.g. "2024-13-03")."""
+
+    def validate(self, user_entered) -> bool:
+        if user_entered == 'exit':
+            return True
+        if not super().validate(user_entered):
+            return False
+        import numpy as np
+        from indexes import parse_dates
+
+        return not np.isnat(parse_dates([user_entered])[0])
+
+    def validate_many(self, values: pd.Series) -> np.ndarray:
+        import numpy as np
+        from indexes import parse_dates
+
+        return super().validate_many(values) & ~np.isnat(parse_dates(values))
 
 
 class ValueInValidator(AbstractValidator):
     def __init__(self, options: iter, err_code: str = 'notfound_command'):
         super().__init__(err_code)
         self.options = options
+        # Options may be given as a list or a dict view, membership is checked against a hashed set
+        self.allowed = frozenset(options)
 
     def validate(self, user_entered: str) -> bool:
         if user_entered == 'exit':
             return True
-        return user_entered in self.options
+        return user_entered in self.allowed
+
+    def validate_many(self, values: pd.Series) -> np.ndarray:
+        return values.isin(self.allowed).to_numpy()
 
 
 class TypeValidator(AbstractValidator):
@@ -41,8 +101,23 @@ class TypeValidator(AbstractValidator):
     def validate(self, user_entered) -> bool:
         if user_entered == 'exit':
             return True
+        # int() accepts numbers of any size and with underscores, the table stores only int64
+        if self.datatype is int:
+            return integer_pattern.fullmatch(user_entered) is not None
         try:
             self.datatype(user_entered)
         except ValueError:
             return False
         return True
+
+    def validate_many(self, values: pd.Series) -> np.ndarray:
+        if self.datatype is int:
+            return values.str.fullmatch(integer_pattern).to_numpy(dtype=bool)
+        return super().validate_many(values)
+
+
+class FileValidator(AbstractValidator):
+    def validate(self, user_entered: str) -> bool:
+        if user_entered == 'exit':
+            return True
+        return os.path.isfile(user_entered)
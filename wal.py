@@ -0,0 +1,210 @@
+import io
+import os
+import zlib
+from typing import Iterator
+
+import pandas as pd
+
+from backends import CsvBackend, sync_directory
+
+try:
+    import fcntl
+except ImportError:  # Advisory locks are not available on Windows
+    fcntl = None
+
+# The log starts with this prefix and a random token that changes on every checkpoint,
+# so a writer notices that the log was emptied and filled again by another process
+header_prefix = b'WAL '
+header_size = len(header_prefix) + 16 + 1
+
+
+class WriteAheadLog:
+    """
+    Journal of the records added to or changed in the database since the last checkpoint.
+
+    Every commit is one record: a header line with the operation, the length of the data and its CRC32,
+    followed by the rows as CSV. A record is written with one write followed by fsync,
+    so a commit costs the same regardless of the size of the database.
+
+    A record interrupted by a crash fails its checksum. It is ignored when the log is read
+    and cut off by the next commit, all the records before it are kept.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        # Token of the log and the offset up to which its records are known to be whole.
+        # Only the records after this offset are checked again before the next commit
+        self.token = None
+        self.end = 0
+
+    def stat(self) -> tuple[int, int]:
+        """Modification time and size of the log, zeros if there is no log."""
+        try:
+            stat = os.stat(self.path)
+        except FileNotFoundError:
+            return 0, 0
+        return stat.st_mtime_ns, stat.st_size
+
+    @property
+    def size(self) -> int:
+        return self.stat()[1]
+
+    @property
+    def position(self) -> tuple[bytes, int]:
+        """Position after the last record read or written by this process."""
+        return self.token, self.end
+
+    @staticmethod
+    def _scan(data: bytes, position: int) -> Iterator[tuple[str, bytes, int]]:
+        """Yields the operation, the data and the end offset of every whole record starting from the position."""
+        while True:
+            newline = data.find(b'\n', position)
+            if newline < 0:
+                return
+
+            try:
+                operation, length, checksum = data[position:newline].decode('ascii').split(' ')
+                length, checksum = int(length), int(checksum, 16)
+            except ValueError:  # Also covers a header that is not ASCII
+                return
+
+            payload = data[newline + 1:newline + 1 + length]
+            if len(payload) != length or zlib.crc32(payload, zlib.crc32(operation.encode())) != checksum:
+                return
+
+            position = newline + 1 + length
+            yield operation, payload, position
+
+    def read(self, position: tuple[bytes, int] = None) -> tuple[list[tuple[str, pd.DataFrame]], tuple[bytes, int]]:
+        """
+        Returns the whole records of the log as (operation, rows), and the position after them.
+        Given a position returned before, returns only the records committed after it,
+        or None instead of the records if the log was emptied since then.
+
+        The records are grouped by operation, so each group is parsed at once: all added records come first,
+        then all changes in the order of their commits. A change always refers to a record added before it,
+        so the result is the same as that of applying the commits one by one.
+        """
+        try:
+            with open(self.path, 'rb') as file:
+                data = file.read()
+        except FileNotFoundError:
+            data = b''
+
+        token = data[:header_size]
+        if len(token) < header_size or not token.startswith(header_prefix):
+            token = None
+        start = header_size
+        if position and position[0] is not None:
+            if position[0] != token:
+                return None, (token, header_size)
+            start = position[1]
+
+        payloads = {'add': [], 'change': []}
+        end = start
+        for operation, payload, end in self._scan(data, start) if token else ():
+            if payloads[operation]:
+                # Every record has its own CSV header, only the first one of a group is kept
+                payload = payload.split(b'\n', 1)[1]
+            payloads[operation].append(payload)
+
+        # The records up to the end are whole, they do not have to be checked again before a commit
+        if token:
+            self.token, self.end = token, end
+
+        # The rows are parsed with the types of the table, e.g. a description "100" stays text
+        records = [(operation, pd.read_csv(io.BytesIO(b''.join(group)), index_col='pk', dtype=CsvBackend.dtypes))
+                   for operation, group in payloads.items() if group]
+        return records, (token, end)
+
+    def _find_end(self, fd: int) -> int:
+        """Returns the end of the last whole record. Called under the lock, when no one else is writing."""
+        size = os.fstat(fd).st_size
+        token = os.pread(fd, header_size, 0)
+
+        if len(token) < header_size or not token.startswith(header_prefix):
+            # A new log, or a log whose creation was interrupted
+            self._write_header(fd)
+            return header_size
+
+        # The records up to the known end were checked already, unless the log was emptied since then
+        start = self.end if token == self.token and header_size <= self.end <= size else header_size
+        self.token = token
+
+        end = start
+        for *_, record_end in self._scan(os.pread(fd, size - start, start), 0):
+            end = start + record_end
+        return end
+
+    def _write_header(self, fd: int) -> None:
+        """Empties the log and gives it a new token."""
+        self.token = header_prefix + os.urandom(8).hex().encode() + b'\n'
+        os.ftruncate(fd, 0)
+        os.pwrite(fd, self.token, 0)
+        self.end = header_size
+
+    def append(self, operation: str, frame: pd.DataFrame, sync: bool = True) -> None:
+        """
+        Commits the rows, indexed by their primary keys, as one record.
+        With sync=False the record is not flushed to the disk until sync() is called.
+        """
+        payload = frame.to_csv(index_label='pk', lineterminator='\n').encode()
+        checksum = zlib.crc32(payload, zlib.crc32(operation.encode()))
+        record = f'{operation} {len(payload)} {checksum:08x}\n'.encode() + payload
+
+        created = not os.path.exists(self.path)
+        fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            if fcntl:
+                fcntl.flock(fd, fcntl.LOCK_EX)
+
+            # The remains of an interrupted commit are overwritten
+            end = self._find_end(fd)
+            os.ftruncate(fd, end)
+            os.pwrite(fd, record, end)
+            if sync:
+                os.fsync(fd)
+            self.end = end + len(record)
+        finally:
+            os.close(fd)  # Closing the descriptor also releases the lock
+
+        if created:
+            sync_directory(self.path)
+
+    def sync(self) -> None:
+        fd = os.open(self.path, os.O_RDONLY)
+        try:
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+
+    def truncate(self, size: int) -> None:
+        """Cuts off everything written after the log had the given size, e.g. the records of a failed import."""
+        if not os.path.exists(self.path):
+            return
+
+        fd = os.open(self.path, os.O_RDWR)
+        try:
+            if fcntl:
+                fcntl.flock(fd, fcntl.LOCK_EX)
+
+            os.ftruncate(fd, size)
+            os.fsync(fd)
+            self.end = min(self.end, size)
+        finally:
+            os.close(fd)
+
+    def reset(self) -> None:
+        """Empties the log after its records were written into the database file."""
+        if not os.path.exists(self.path):
+            return
+
+        fd = os.open(self.path, os.O_RDWR)
+        try:
+            if fcntl:
+                fcntl.flock(fd, fcntl.LOCK_EX)
+
+            self._write_header(fd)
+            os.fsync(fd)
+        finally:
+            os.close(fd)